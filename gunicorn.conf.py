@@ -0,0 +1,35 @@
+# Configuración de gunicorn (se lee automáticamente desde la raíz del repo).
+# La app se carga en el maestro antes de hacer fork: imports, blueprints y
+# vistas de admin se comparten entre workers en lugar de duplicarse.
+import gc
+import os
+
+preload_app = True
+
+# Los streams SSE (/api/orders/stream) mantienen la petición abierta: con
+# workers sync cada conexión ocuparía un worker entero. Con gthread cada
+# stream ocupa uno de los `threads` hilos; ORDER_STREAM_MAX_CONNECTIONS (8 por
+# defecto) deja el resto para las demás peticiones. Para muchos clientes a la
+# vez, GUNICORN_WORKER_CLASS=gevent y un ORDER_STREAM_MAX_CONNECTIONS mayor.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+
+def pre_fork(server, worker):
+    # Los objetos cargados en el maestro (app, índice de sugerencias) pasan a
+    # la generación permanente: el GC de los workers no los recorre y sus
+    # páginas siguen compartidas.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el maestro no se pueden compartir entre
+    # procesos: cada worker abre su propio pool.
+    from wsgi import application
+    from api.models import db
+    from api.logs import restart_logging_after_fork
+    # El listener de logs es un hilo del maestro: se arranca uno por worker
+    # antes de que los hilos de gthread empiecen a registrar
+    restart_logging_after_fork()
+    with application.app_context():
+        db.engine.dispose(close=False)
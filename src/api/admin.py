@@ -1,17 +1,193 @@
-  
 import os
 from flask_admin import Admin
-from .models import db, User
-from flask_admin.contrib.sqla import ModelView
+from flask_admin.contrib.sqla import ModelView, filters
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.orm import Query
+from werkzeug.security import generate_password_hash
+from wtforms import PasswordField
+from wtforms.validators import ValidationError
+from .models import db, User, Category, Product, CartItem, Order, OrderItem, RelatedProduct
+from .catalog import invalidate_products
+
+
+class BoundedCountQuery:
+    """
+    Envuelve la consulta de conteo de Flask-Admin para no ejecutar un
+    COUNT(*) exacto sobre tablas grandes.
+
+    Flask-Admin va aplicando búsqueda y filtros con .filter()/.join() sobre
+    esta consulta; cada llamada devuelve otro envoltorio marcado como filtrado.
+    Al final .scalar() usa la estimación del planificador (Postgres) si no hay
+    filtros, o cuenta como máximo `cap + 1` filas.
+    """
+
+    def __init__(self, view, query, filtered=False):
+        self._view = view
+        self._query = query
+        self._filtered = filtered
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if isinstance(result, Query):
+                return BoundedCountQuery(self._view, result, filtered=True)
+            return result
+        return wrapper
+
+    def scalar(self):
+        cap = self._view.count_cap
+        if not self._filtered:
+            estimate = self._view.estimate_count()
+            if estimate is not None and estimate > cap:
+                return estimate
+
+        bounded = self._query.limit(cap + 1).subquery()
+        return self._query.session.query(func.count()).select_from(bounded).scalar()
+
+
+class ScalableModelView(ModelView):
+    """
+    ModelView base para tablas grandes: tamaño de página configurable y
+    acotado, conteos aproximados/limitados y ordenación solo por columnas
+    indexadas (cada vista define column_sortable_list y column_filters).
+    """
+    can_set_page_size = True
+    page_size = 50
+    max_page_size = 200
+    count_cap = 10000
+
+    def __init__(self, model, session, page_size=None, max_page_size=None,
+                 count_cap=None, **kwargs):
+        if page_size:
+            self.page_size = page_size
+        if max_page_size:
+            self.max_page_size = max_page_size
+        if count_cap:
+            self.count_cap = count_cap
+        super().__init__(model, session, **kwargs)
+
+    def get_count_query(self):
+        query = self.session.query(literal_column('1')).select_from(self.model)
+        return BoundedCountQuery(self, query)
+
+    def estimate_count(self):
+        """Filas estimadas por Postgres (pg_class.reltuples); None en otros motores"""
+        bind = self.session.get_bind()
+        if bind.dialect.name != 'postgresql':
+            return None
+        estimate = self.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)'),
+            {'t': self.model.__table__.name}
+        ).scalar()
+        # reltuples vale -1 (o 0) mientras la tabla no se ha analizado
+        return estimate if estimate and estimate > 0 else None
+
+    def _get_list_extra_args(self):
+        # Se acota aquí y no en get_list: index_view calcula el número de
+        # páginas con este page_size. Con 0 o negativo (LIMIT -1 en SQLite es
+        # "sin límite") se devolvería la tabla entera.
+        view_args = super()._get_list_extra_args()
+        page_size = view_args.page_size or self.page_size
+        view_args.page_size = max(1, min(page_size, self.max_page_size))
+        return view_args
+
+
+class UserView(ScalableModelView):
+    column_list = ('id', 'email', 'first_name', 'last_name', 'is_active')
+    column_sortable_list = ('id', 'email')
+    # Solo igualdad exacta: 'contains' genera LIKE '%...%' y no usa el índice
+    column_filters = ('id', filters.FilterEqual(User.email, 'Email'))
+    column_default_sort = ('id', True)
+    form_excluded_columns = ('password', 'cart_items', 'orders', 'cart_revision')
+    # El hash nunca se muestra: el campo solo sirve para fijar una contraseña nueva
+    form_extra_fields = {'new_password': PasswordField('Password')}
+
+    def on_model_change(self, form, model, is_created):
+        if form.new_password.data:
+            model.password = generate_password_hash(form.new_password.data)
+        elif is_created:
+            raise ValidationError('Password is required')
+
+
+class CategoryView(ScalableModelView):
+    column_list = ('id', 'name', 'description')
+    column_sortable_list = ('id',)
+    form_excluded_columns = ('products',)
+
+    def after_model_change(self, form, model, is_created):
+        # Las fichas cacheadas incluyen el nombre de la categoría
+        invalidate_products()
+
+
+class ProductView(ScalableModelView):
+    column_list = ('id', 'name', 'category.name', 'price', 'stock', 'is_active')
+    column_labels = {'category.name': 'Category'}
+    column_select_related_list = (Product.category,)
+    column_sortable_list = ('id', 'category_id')
+    column_filters = ('id', 'category_id')
+    column_default_sort = ('id', True)
+    form_excluded_columns = ('cart_items', 'order_items', 'version')
+
+    def after_model_change(self, form, model, is_created):
+        invalidate_products([model.id])
+
+    def on_model_delete(self, model):
+        self.session.query(RelatedProduct).filter(
+            (RelatedProduct.product_id == model.id) | (RelatedProduct.related_id == model.id)
+        ).delete(synchronize_session=False)
+
+    def after_model_delete(self, model):
+        invalidate_products([model.id])
+
+
+class CartItemView(ScalableModelView):
+    column_list = ('id', 'user.email', 'product.name', 'quantity')
+    column_labels = {'user.email': 'User', 'product.name': 'Product'}
+    column_select_related_list = (CartItem.user, CartItem.product)
+    column_sortable_list = ('id', 'user_id', 'product_id')
+    column_filters = ('user_id', 'product_id')
+    column_default_sort = ('id', True)
+
+
+class OrderView(ScalableModelView):
+    column_list = ('id', 'user.email', 'status', 'total_amount', 'created_at')
+    column_labels = {'user.email': 'User'}
+    column_select_related_list = (Order.user,)
+    column_sortable_list = ('id', 'user_id', 'status', 'created_at')
+    column_filters = ('user_id', filters.FilterEqual(Order.status, 'Status'),
+                      'created_at')
+    column_default_sort = ('id', True)
+    form_excluded_columns = ('items',)
+
+
+class OrderItemView(ScalableModelView):
+    column_list = ('id', 'order_id', 'product.name', 'quantity', 'price')
+    column_labels = {'product.name': 'Product'}
+    column_select_related_list = (OrderItem.product,)
+    column_sortable_list = ('id', 'order_id', 'product_id')
+    column_filters = ('order_id', 'product_id')
+    column_default_sort = ('id', True)
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
-    # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    # Tamaño de página y tope de conteo configurables por entorno
+    options = {
+        'page_size': int(app.config.get('ADMIN_PAGE_SIZE') or os.getenv('ADMIN_PAGE_SIZE', 50)),
+        'max_page_size': int(app.config.get('ADMIN_MAX_PAGE_SIZE') or os.getenv('ADMIN_MAX_PAGE_SIZE', 200)),
+        'count_cap': int(app.config.get('ADMIN_COUNT_CAP') or os.getenv('ADMIN_COUNT_CAP', 10000)),
+    }
 
-    # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    admin.add_view(UserView(User, db.session, **options))
+    admin.add_view(CategoryView(Category, db.session, **options))
+    admin.add_view(ProductView(Product, db.session, **options))
+    admin.add_view(CartItemView(CartItem, db.session, **options))
+    admin.add_view(OrderView(Order, db.session, **options))
+    admin.add_view(OrderItemView(OrderItem, db.session, **options))
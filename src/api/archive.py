@@ -0,0 +1,147 @@
+"""
+Archivado de pedidos completados (`flask archive-orders --older-than 1y`).
+
+Los pedidos entregados o cancelados anteriores al corte se mueven por lotes,
+cada uno en su transacción, a order_archive / order_item_archive:
+INSERT ... SELECT en las tablas de archivo y DELETE de order_item, order_event
+y order. Las tablas calientes solo conservan los pedidos recientes o abiertos.
+
+En Postgres las tablas de archivo están particionadas por año de created_at y
+las particiones se crean según hacen falta. En otros motores (o si las tablas
+ya existían sin particionar) son tablas normales.
+
+GET /api/orders?include_archived=1 y GET /api/orders/<id> leen del archivo
+por el índice (user_id, created_at) solo cuando se piden.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, func, literal, text, and_, or_
+from api.models import (db, Order, OrderItem, OrderEvent, Product,
+                        ArchivedOrder, ArchivedOrderItem, serialize_order_item)
+
+COMPLETED_STATUSES = ('delivered', 'cancelled')
+AGE_UNITS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+
+
+def parse_age(value):
+    """'90d', '6m', '2y' o un número de días -> timedelta"""
+    match = re.fullmatch(r'\s*(\d+)\s*([dwmy]?)\s*', str(value).lower())
+    if not match:
+        raise ValueError(f"Antigüedad no válida: {value} (usa p.ej. 90d, 6m, 1y)")
+    return timedelta(days=int(match.group(1)) * AGE_UNITS[match.group(2) or 'd'])
+
+
+def _partitioned(table):
+    return db.session.scalar(
+        text('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)'),
+        {'t': table}) is not None
+
+
+def _ensure_partitions(first, last):
+    """Particiones anuales de las tablas de archivo que cubren [first, last]"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in (ArchivedOrder.__tablename__, ArchivedOrderItem.__tablename__):
+        if not _partitioned(table):
+            continue
+        for year in range(first.year, last.year + 1):
+            db.session.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{table}_{year}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"))
+
+
+def _eligible(cutoff):
+    return select(Order.id).where(
+        Order.status.in_(COMPLETED_STATUSES), Order.created_at < cutoff)
+
+
+def count_archivable(cutoff):
+    return db.session.scalar(select(func.count()).select_from(_eligible(cutoff).subquery()))
+
+
+def archive_orders(cutoff, chunk_size=1000, echo=print):
+    """Mueve al archivo los pedidos completados anteriores a `cutoff`; devuelve (pedidos, líneas)"""
+    order_total = item_total = 0
+    # UTC sin zona, como el resto de columnas DateTime (utcnow() está obsoleto)
+    archived_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    postgres = db.engine.dialect.name == 'postgresql'
+
+    while True:
+        query = _eligible(cutoff).order_by(Order.id).limit(chunk_size)
+        if postgres:
+            # Otro proceso archivando a la vez se salta los lotes bloqueados
+            query = query.with_for_update(skip_locked=True)
+        ids = db.session.scalars(query).all()
+        if not ids:
+            break
+
+        first, last = db.session.execute(
+            select(func.min(Order.created_at), func.max(Order.created_at)).where(Order.id.in_(ids))).one()
+        _ensure_partitions(first, last)
+
+        db.session.execute(insert(ArchivedOrder).from_select(
+            ['id', 'created_at', 'user_id', 'total_amount', 'status', 'archived_at'],
+            select(Order.id, Order.created_at, Order.user_id, Order.total_amount, Order.status,
+                   literal(archived_at, ArchivedOrder.archived_at.type))
+            .where(Order.id.in_(ids))))
+        items = db.session.execute(insert(ArchivedOrderItem).from_select(
+            ['id', 'order_created_at', 'order_id', 'product_id', 'quantity', 'price'],
+            select(OrderItem.id, Order.created_at, OrderItem.order_id, OrderItem.product_id,
+                   OrderItem.quantity, OrderItem.price)
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.id.in_(ids)))).rowcount
+
+        db.session.execute(delete(OrderEvent).where(OrderEvent.order_id.in_(ids)))
+        db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids)))
+        db.session.execute(delete(Order).where(Order.id.in_(ids)))
+        db.session.commit()
+
+        order_total += len(ids)
+        item_total += items
+        echo(f"  archived {order_total} orders, {item_total} items")
+    return order_total, item_total
+
+
+def _archived_items(session, order_rows):
+    """{order_id: [líneas serializadas]} en una consulta (más una para los productos)"""
+    if not order_rows:
+        return {}
+    items = session.scalars(
+        select(ArchivedOrderItem)
+        .where(ArchivedOrderItem.order_id.in_([order.id for order in order_rows]))
+        .order_by(ArchivedOrderItem.id)).all()
+    product_ids = {item.product_id for item in items}
+    products = {product.id: product for product in session.scalars(
+        select(Product).where(Product.id.in_(product_ids)))} if product_ids else {}
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[item.order_id].append(serialize_order_item(item, products.get(item.product_id)))
+    return grouped
+
+
+def before_cursor(created_at_column, id_column, cursor):
+    """Condición de paginación por (created_at, id) descendente: filas anteriores a `cursor`"""
+    created_at, order_id = cursor
+    return or_(created_at_column < created_at,
+               and_(created_at_column == created_at, id_column < order_id))
+
+
+def archived_orders(session, user_id, limit, cursor=None):
+    """Pedidos archivados del usuario por (created_at, id) descendente, anteriores a `cursor`"""
+    query = select(ArchivedOrder).where(ArchivedOrder.user_id == user_id)
+    if cursor is not None:
+        query = query.where(before_cursor(ArchivedOrder.created_at, ArchivedOrder.id, cursor))
+    orders = session.scalars(
+        query.order_by(ArchivedOrder.created_at.desc(), ArchivedOrder.id.desc())
+        .limit(limit)).all()
+    items = _archived_items(session, orders)
+    return [order.serialize(items.get(order.id, [])) for order in orders]
+
+
+def archived_order(session, user_id, order_id):
+    order = session.scalar(select(ArchivedOrder).where(
+        ArchivedOrder.id == order_id, ArchivedOrder.user_id == user_id))
+    if order is None:
+        return None
+    return order.serialize(_archived_items(session, [order]).get(order.id, []))
@@ -0,0 +1,182 @@
+"""
+Endpoint /api/batch: ejecuta varias peticiones de la API en una sola ida y vuelta
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app, has_request_context
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+from api.models import db
+from api.replica import note_write, wrote_in_request
+
+batch = Blueprint('batch', __name__)
+log = logging.getLogger('api')
+
+ALLOWED_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+READ_ONLY_METHODS = ('GET',)
+# Vistas que no se pueden anidar: el propio lote y los streams que no terminan.
+# Se comparan por endpoint, ya resuelto el path (p. ej. /api/%62atch)
+EXCLUDED_ENDPOINTS = ('batch.run_batch', 'order_events.stream_orders')
+# (token, claims) del lote, para no volver a decodificar el JWT en cada sub-petición
+BATCH_JWT_KEY = 'api.batch_jwt'
+
+
+class BatchJWTManager(JWTManager):
+    """JWTManager que reutiliza el token ya decodificado por /api/batch"""
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        cached = request.environ.get(BATCH_JWT_KEY) if has_request_context() else None
+        if cached is not None and csrf_value is None and cached[0] == encoded_token:
+            return cached[1]
+        return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+
+def _build_environ(sub, headers, token):
+    environ = EnvironBuilder(
+        path=sub['path'],
+        base_url=request.host_url,
+        method=sub['method'],
+        headers=headers,
+        json=sub.get('body'),
+    ).get_environ()
+    if token is not None:
+        environ[BATCH_JWT_KEY] = token
+    return environ
+
+
+def _dispatch(app, environ):
+    """
+    Ejecuta una sub-petición con el pipeline completo de Flask (hooks,
+    manejadores de error, JWT). Reutiliza el app context activo, y con él
+    la sesión de base de datos, si lo hay.
+    """
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            log.exception("Batch sub-request error", extra={'event': 'batch_error'})
+            db.session.rollback()
+            return {'status': 500, 'body': {'error': 'Internal server error'}}
+        try:
+            body = response.get_json(silent=True)
+            if body is None and not response.is_streamed:
+                body = response.get_data(as_text=True)
+            return {'status': response.status_code, 'body': body}
+        finally:
+            # Nadie itera las respuestas en streaming: se cierran para liberar sus recursos
+            response.close()
+
+
+def _dispatch_isolated(app, environ, wrote):
+    # Cada hilo necesita su propio app context: la sesión no es thread-safe.
+    # Si el lote ya ha escrito, la lectura no puede ir a la réplica.
+    with app.app_context():
+        if wrote:
+            note_write()
+        return _dispatch(app, environ)
+
+
+def _validate(subrequests, max_requests):
+    if not isinstance(subrequests, list) or not subrequests:
+        return "Se requiere una lista 'requests' no vacía"
+    if len(subrequests) > max_requests:
+        return f"Máximo {max_requests} peticiones por lote"
+    for sub in subrequests:
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            return "Cada petición necesita 'method' y 'path'"
+        sub['method'] = str(sub.get('method', 'GET')).upper()
+        if sub['method'] not in ALLOWED_METHODS:
+            return f"Método no permitido: {sub['method']}"
+        if not sub['path'].startswith('/api/'):
+            return f"Ruta no permitida: {sub['path']}"
+    return None
+
+
+def _endpoint(app, environ):
+    """Endpoint al que irá la sub-petición; None si no hay ruta (404/405 al ejecutarla)"""
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    return endpoint
+
+
+def _read_runs(subrequests):
+    """Divide el lote en tramos (inicio, fin): GET consecutivos juntos, cada escritura sola"""
+    start = 0
+    for i, sub in enumerate(subrequests):
+        if sub['method'] not in READ_ONLY_METHODS:
+            if start < i:
+                yield start, i
+            yield i, i + 1
+            start = i + 1
+    if start < len(subrequests):
+        yield start, len(subrequests)
+
+
+@batch.route('/batch', methods=['POST'])
+@jwt_required(optional=True)
+def run_batch():
+    """
+    Body: {"requests": [{"method": "GET", "path": "/api/products"}, ...],
+           "parallel": false}
+
+    Las sub-peticiones se ejecutan en orden dentro del mismo app context, con
+    la misma identidad y la misma sesión. Se reenvía el Authorization junto
+    con sus claims ya validados, así que el JWT se decodifica una sola vez.
+    Con "parallel": true cada tramo de GET consecutivos se ejecuta a la vez,
+    cada uno con su propia sesión; el orden respecto a las escrituras se respeta.
+    """
+    config = current_app.config
+    # Límite del stream y no solo de Content-Length, que los cuerpos chunked no
+    # traen. Werkzeug corta el stream en el límite sin error, de ahí el byte extra.
+    max_bytes = config['BATCH_MAX_BYTES']
+    request.max_content_length = max_bytes + 1
+    try:
+        too_large = len(request.get_data(cache=True)) > max_bytes
+    except RequestEntityTooLarge:
+        too_large = True
+    if too_large:
+        return jsonify({"error": "Lote demasiado grande"}), 413
+
+    data = request.get_json(silent=True) or {}
+    subrequests = data.get('requests')
+    error = _validate(subrequests, config['BATCH_MAX_REQUESTS'])
+    if error:
+        return jsonify({"error": error}), 400
+
+    headers = {}
+    # La cookie de lectura tras escritura (réplica) vale también para las sub-peticiones
+    if 'Cookie' in request.headers:
+        headers['Cookie'] = request.headers['Cookie']
+    token = None
+    if 'Authorization' in request.headers:
+        headers['Authorization'] = request.headers['Authorization']
+        claims = get_jwt()
+        if claims:
+            token = (headers['Authorization'].split(None, 1)[-1], claims)
+
+    app = current_app._get_current_object()
+    environs = [_build_environ(sub, headers, token) for sub in subrequests]
+    for sub, environ in zip(subrequests, environs):
+        if _endpoint(app, environ) in EXCLUDED_ENDPOINTS:
+            return jsonify({"error": f"Ruta no permitida: {sub['path']}"}), 400
+
+    results = []
+    if data.get('parallel'):
+        # Solo se paralelizan tramos consecutivos de GET; las escrituras
+        # mantienen su posición respecto a las lecturas
+        for start, end in _read_runs(subrequests):
+            if end - start > 1:
+                wrote = wrote_in_request()
+                with ThreadPoolExecutor(max_workers=config['BATCH_MAX_WORKERS']) as pool:
+                    futures = [pool.submit(_dispatch_isolated, app, environ, wrote)
+                               for environ in environs[start:end]]
+                results.extend(future.result() for future in futures)
+            else:
+                results.append(_dispatch(app, environs[start]))
+    else:
+        results = [_dispatch(app, environ) for environ in environs]
+
+    return jsonify({"results": results}), 200
@@ -0,0 +1,205 @@
+"""
+Ficha de producto: caché en memoria y productos relacionados precalculados.
+
+GET /api/products/<id> sirve un dict ya serializado (producto + categoría +
+relacionados) desde un LRU por proceso con límite de tamaño (PRODUCT_CACHE_SIZE)
+y de antigüedad (PRODUCT_CACHE_TTL). Las rutas que escriben productos llaman a
+invalidate_products(); los demás workers de gunicorn ven el cambio al caducar
+el TTL. Con réplica de lectura, durante REPLICA_STICKY_SECONDS tras una
+invalidación las fichas leídas de la réplica se sirven pero no se guardan: la
+réplica puede ir por detrás y dejaría la versión antigua en caché todo el TTL.
+
+Los relacionados se guardan en la tabla related_product, que recalcula
+`flask compute-related` (cron o proceso aparte con --every) a partir de:
+- co-compras: veces que aparecen juntos en el mismo pedido (OrderItem),
+- misma categoría,
+- precio cercano.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from flask import current_app
+from sqlalchemy import select, func, delete, and_
+from sqlalchemy.orm import aliased, joinedload
+from api.models import db, Product, OrderItem, RelatedProduct
+from api.suggest import products_changed
+
+# Pesos de cada señal en la puntuación de un relacionado
+CO_PURCHASE_WEIGHT = 2.0
+SAME_CATEGORY_WEIGHT = 1.0
+PRICE_WEIGHT = 1.0
+# Vecinos por precio que se consideran a cada lado dentro de la categoría
+PRICE_NEIGHBOURS = 10
+INSERT_CHUNK = 5000
+
+
+class ProductCache:
+    """LRU thread-safe con TTL de fichas de producto ya serializadas"""
+
+    def __init__(self, max_size, ttl, replica_lag=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.replica_lag = replica_lag
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Cambia con cada invalidación: una carga que empezó antes no se guarda
+        self.generation = 0
+        self.invalidated_at = float('-inf')
+        self.hits = self.misses = 0
+
+    def get(self, product_id):
+        with self.lock:
+            entry = self.entries.get(product_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None, self.generation
+            self.entries.move_to_end(product_id)
+            self.hits += 1
+            return entry[1], self.generation
+
+    def put(self, product_id, value, generation, from_replica=False):
+        with self.lock:
+            if generation != self.generation or self.max_size <= 0:
+                return
+            if from_replica and time.monotonic() - self.invalidated_at < self.replica_lag:
+                return
+            self.entries[product_id] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(product_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, product_ids=None):
+        """Borra las fichas de esos productos y las que los listan como relacionados"""
+        with self.lock:
+            self.generation += 1
+            self.invalidated_at = time.monotonic()
+            if product_ids is None:
+                self.entries.clear()
+                return
+            ids = set(product_ids)
+            stale = [key for key, (_, value) in self.entries.items()
+                     if key in ids or any(item['id'] in ids for item in value['related'])]
+            for key in stale:
+                del self.entries[key]
+
+
+def product_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('product_cache')
+    if cache is None:
+        replica_lag = app.config['REPLICA_STICKY_SECONDS'] if 'replica' in app.extensions else 0
+        cache = app.extensions.setdefault('product_cache', ProductCache(
+            app.config['PRODUCT_CACHE_SIZE'], app.config['PRODUCT_CACHE_TTL'], replica_lag))
+    return cache
+
+
+def invalidate_products(product_ids=None):
+    """Avisa de cambios en productos: caché de fichas e índice de sugerencias"""
+    product_cache().invalidate(product_ids)
+    products_changed(product_ids)
+
+
+def load_product_detail(session, product_id):
+    """Producto, su categoría y sus relacionados activos en dos consultas"""
+    product = session.scalar(
+        select(Product).options(joinedload(Product.category)).where(Product.id == product_id))
+    if product is None:
+        return None
+    related = session.scalars(
+        select(Product)
+        .join(RelatedProduct, RelatedProduct.related_id == Product.id)
+        .where(RelatedProduct.product_id == product_id, Product.is_active.is_(True))
+        .order_by(RelatedProduct.rank)
+    ).all()
+
+    detail = product.serialize()
+    detail['category'] = product.category.serialize() if product.category else None
+    detail['related'] = [{
+        'id': item.id,
+        'name': item.name,
+        'price': float(item.price),
+        'image_url': item.image_url,
+        'stock': item.stock,
+    } for item in related]
+    return detail
+
+
+def get_product_detail(session, product_id):
+    cache = product_cache()
+    detail, generation = cache.get(product_id)
+    if detail is None:
+        detail = load_product_detail(session, product_id)
+        if detail is not None:
+            cache.put(product_id, detail, generation, from_replica=session is not db.session)
+    return detail
+
+
+def _co_purchases(session):
+    """{producto: {otro: veces comprados en el mismo pedido}}"""
+    other = aliased(OrderItem)
+    rows = session.execute(
+        select(OrderItem.product_id, other.product_id, func.count())
+        .join(other, and_(other.order_id == OrderItem.order_id,
+                          other.product_id != OrderItem.product_id))
+        .group_by(OrderItem.product_id, other.product_id)
+    )
+    counts = defaultdict(dict)
+    for product_id, other_id, count in rows:
+        counts[product_id][other_id] = count
+    return counts
+
+
+def _price_neighbours(products):
+    """{producto: [ids de la misma categoría con precio cercano]}"""
+    by_category = defaultdict(list)
+    for product_id, category_id, price in products:
+        by_category[category_id].append((price, product_id))
+    neighbours = {}
+    for items in by_category.values():
+        items.sort()
+        for index, (_, product_id) in enumerate(items):
+            window = items[max(0, index - PRICE_NEIGHBOURS):index + PRICE_NEIGHBOURS + 1]
+            neighbours[product_id] = [other_id for _, other_id in window if other_id != product_id]
+    return neighbours
+
+
+def compute_related(session, limit):
+    """Lista de filas (product_id, related_id, rank, score) para todos los productos activos"""
+    products = session.execute(
+        select(Product.id, Product.category_id, Product.price).where(Product.is_active.is_(True))
+    ).all()
+    info = {product_id: (category_id, float(price)) for product_id, category_id, price in products}
+    co_purchases = _co_purchases(session)
+    neighbours = _price_neighbours([(pid, cat, price) for pid, (cat, price) in info.items()])
+
+    rows = []
+    for product_id, (category_id, price) in info.items():
+        bought = co_purchases.get(product_id, {})
+        top_count = max(bought.values(), default=0)
+        scores = {}
+        for other_id in set(bought) | set(neighbours.get(product_id, ())):
+            if other_id not in info:
+                continue
+            other_category, other_price = info[other_id]
+            score = CO_PURCHASE_WEIGHT * bought.get(other_id, 0) / top_count if top_count else 0.0
+            if other_category == category_id:
+                score += SAME_CATEGORY_WEIGHT
+            if price > 0:
+                score += PRICE_WEIGHT * max(0.0, 1 - abs(other_price - price) / price)
+            scores[other_id] = score
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        rows.extend({'product_id': product_id, 'related_id': other_id,
+                     'rank': rank, 'score': round(score, 4)}
+                    for rank, (other_id, score) in enumerate(best))
+    return rows
+
+
+def refresh_related_products(limit=8):
+    """Recalcula related_product entera en una transacción; devuelve las filas escritas"""
+    rows = compute_related(db.session, limit)
+    db.session.execute(delete(RelatedProduct))
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(RelatedProduct.__table__.insert(), rows[start:start + INSERT_CHUNK])
+    db.session.commit()
+    invalidate_products()
+    return len(rows)
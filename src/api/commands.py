@@ -1,5 +1,6 @@
 
 import click
+from werkzeug.security import generate_password_hash
 from api.models import db, User, Category, Product
 
 """
@@ -19,19 +20,77 @@ def setup_commands(app):
     @click.argument("count")  # argument of out command
     def insert_test_users(count):
         print("Creating test users")
+        # Todos comparten contraseña: se calcula el hash una sola vez
+        password = generate_password_hash("123456")
         for x in range(1, int(count) + 1):
             user = User()
             user.email = "test_user" + str(x) + "@test.com"
             user.first_name = f"Usuario{x}"
             user.last_name = "Prueba"
-            user.set_password("123456")
+            user.password = password
             user.is_active = True
             db.session.add(user)
-            db.session.commit()
             print("User: ", user.email, " created.")
 
+        db.session.commit()
         print("All test users created")
 
+    @app.cli.command("seed")
+    @click.option("--scale", default=1.0, type=float,
+                  help="Factor de escala: 1 = 10k usuarios, 1k productos, 20k pedidos")
+    @click.option("--seed", "seed_value", default=42, type=int,
+                  help="Semilla; la misma semilla genera exactamente los mismos datos")
+    @click.option("--workers", default=1, type=int,
+                  help="Procesos para generar los datos en paralelo")
+    @click.option("--chunk-size", default=5000, type=int,
+                  help="Filas por INSERT masivo")
+    def seed(scale, seed_value, workers, chunk_size):
+        """Genera un dataset sintético para pruebas de carga: $ flask seed --scale 10"""
+        from api.seed import run_seed
+        print(f"Seeding scale={scale} seed={seed_value} workers={workers}...")
+        run_seed(scale, seed=seed_value, workers=workers, chunk_size=chunk_size)
+        print("🎉 Seed completed")
+
+    @app.cli.command("compute-related")
+    @click.option("--limit", default=8, type=int, help="Relacionados por producto")
+    @click.option("--every", default=0, type=int,
+                  help="Repetir cada N segundos (para ejecutarlo como proceso en segundo plano)")
+    def compute_related(limit, every):
+        """Precalcula los productos relacionados: $ flask compute-related"""
+        import time
+        from api.catalog import refresh_related_products
+        while True:
+            started = time.perf_counter()
+            rows = refresh_related_products(limit)
+            print(f"✅ related_product: {rows} rows in {time.perf_counter() - started:.1f}s")
+            if every <= 0:
+                break
+            db.session.remove()
+            time.sleep(every)
+
+    @app.cli.command("archive-orders")
+    @click.option("--older-than", default="365d",
+                  help="Antigüedad mínima de los pedidos a archivar: 90d, 6m, 1y...")
+    @click.option("--chunk-size", default=1000, type=int,
+                  help="Pedidos movidos por transacción")
+    @click.option("--dry-run", is_flag=True, help="Solo cuenta los pedidos que se archivarían")
+    def archive_orders_command(older_than, chunk_size, dry_run):
+        """Mueve los pedidos entregados/cancelados antiguos a order_archive: $ flask archive-orders --older-than 1y"""
+        import time
+        from datetime import datetime, timezone
+        from api.archive import parse_age, count_archivable, archive_orders
+        try:
+            cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - parse_age(older_than)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--older-than")
+        if dry_run:
+            print(f"{count_archivable(cutoff)} orders created before {cutoff:%Y-%m-%d} would be archived")
+            return
+        print(f"Archiving completed orders created before {cutoff:%Y-%m-%d}...")
+        started = time.perf_counter()
+        orders, items = archive_orders(cutoff, chunk_size=max(chunk_size, 1))
+        print(f"✅ {orders} orders, {items} items archived in {time.perf_counter() - started:.1f}s")
+
     @app.cli.command("create-sample-data")
     def create_sample_data():
         """Crear datos de prueba para la tienda"""
@@ -0,0 +1,129 @@
+"""
+Sondas para el orquestador y estadísticas del pool de conexiones.
+
+/healthz  solo comprueba que el proceso responde; no toca la base de datos.
+/readyz   devuelve el último resultado de un SELECT 1 que se refresca en segundo
+          plano como mucho cada HEALTH_CHECK_INTERVAL segundos, más el estado
+          del pool (tamaño, conexiones en uso, overflow y esperas recientes)
+          y de la cola de logs (pendientes y descartados).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from api.models import db
+from api.logs import log_stats
+
+health = Blueprint('health', __name__)
+log = logging.getLogger('api')
+
+WAIT_SAMPLES = 1000
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra cuánto espera cada checkout de conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_waits = deque(maxlen=WAIT_SAMPLES)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_waits.append(time.perf_counter() - started)
+
+
+def configure_pool(app):
+    """Usar TimedQueuePool salvo que la configuración elija otro pool"""
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('poolclass', TimedQueuePool)
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(),
+                     overflow=pool.overflow(), checked_in=pool.checkedin())
+    waits = sorted(getattr(pool, 'checkout_waits', ()))
+    if waits:
+        stats['checkout_wait_ms'] = {
+            'samples': len(waits),
+            'avg': round(sum(waits) / len(waits) * 1000, 3),
+            'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 3),
+            'max': round(waits[-1] * 1000, 3),
+        }
+    return stats
+
+
+class DatabaseCheck:
+    """Resultado cacheado del SELECT 1; un solo refresco en curso por proceso"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.result = None
+        self.checked_at = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get(self, app):
+        if self.result is None:
+            self.refresh(app)
+            return self.result
+
+        with self.lock:
+            stale = time.monotonic() - self.checked_at >= self.interval
+            start = stale and not self.refreshing
+            if start:
+                self.refreshing = True
+        if start:
+            threading.Thread(target=self.refresh, args=(app,), daemon=True).start()
+        return self.result
+
+    def refresh(self, app):
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                with db.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            result = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 3)}
+        except Exception:
+            log.exception("Readiness check failed", extra={'event': 'readiness_failed'})
+            result = {'ok': False}
+        with self.lock:
+            self.result = result
+            self.checked_at = time.monotonic()
+            self.refreshing = False
+
+
+def database_check():
+    app = current_app._get_current_object()
+    check = app.extensions.get('database_check')
+    if check is None:
+        check = app.extensions.setdefault(
+            'database_check', DatabaseCheck(app.config['HEALTH_CHECK_INTERVAL']))
+    result = dict(check.get(app))
+    result['age_s'] = round(time.monotonic() - check.checked_at, 3)
+    return result
+
+
+@health.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'}), 200
+
+
+@health.route('/readyz', methods=['GET'])
+def readyz():
+    database = database_check()
+    body = {
+        'status': 'ok' if database['ok'] else 'error',
+        'database': database,
+        'pool': pool_stats(db.engine),
+        'logging': log_stats(),
+    }
+    return jsonify(body), 200 if database['ok'] else 503
@@ -0,0 +1,221 @@
+"""
+Logs estructurados (una línea JSON por registro) sin coste de E/S en la petición.
+
+- El hilo de la petición solo filtra el registro, le añade el contexto
+  (request_id, ruta, usuario, latencia) y lo mete en una cola acotada. Si la
+  cola está llena el registro se descarta y se cuenta: nunca se bloquea.
+- Un QueueListener en otro hilo formatea a JSON y escribe en stdout.
+- Cada tipo de mensaje (extra={'event': ...}) puede muestrearse
+  (LOG_SAMPLE_RATES) y tiene un máximo de LOG_RATE_LIMIT registros por
+  segundo; el primero que pasa tras un corte lleva `suppressed` con los
+  descartados. El log de acceso ('request') no tiene máximo: una línea por
+  petición es el volumen esperado y solo se reduce con muestreo.
+- Tras un fork (gunicorn --preload) el worker arranca su propio listener en
+  post_fork (restart_logging_after_fork); si otro fork no lo hace, el primer
+  registro lo arranca bajo un lock.
+
+Uso: log = logging.getLogger('api'); log.warning("...", extra={'event': 'login_failed'})
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+
+LOGGER_NAME = 'api'
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Tipos de mensaje sin máximo por segundo (sí se pueden muestrear)
+RATE_LIMIT_EXEMPT = ('request',)
+
+# Atributos estándar de LogRecord: el resto son campos de `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message'}
+
+
+def parse_sample_rates(value):
+    """'jwt_invalid=0.1,request=0.5' -> {'jwt_invalid': 0.1, 'request': 0.5}"""
+    rates = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            event, rate = part.split('=', 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """Añade el contexto de la petición actual (se ejecuta en el hilo de la petición)"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule else request.path
+            if not hasattr(record, 'user_id'):
+                record.user_id = _current_user_id()
+            started = g.get('request_started')
+            if started is not None and not hasattr(record, 'latency_ms'):
+                record.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+
+def _current_user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # La ruta no verifica JWT
+        return None
+
+
+class RateLimitFilter(logging.Filter):
+    """Muestreo por tipo de mensaje y máximo de registros por segundo"""
+
+    def __init__(self, sample_rates, rate_limit, exempt=RATE_LIMIT_EXEMPT):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limit = rate_limit
+        self.exempt = frozenset(exempt)
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'event', None) or f'{record.name}:{record.levelname}'
+        rate = self.sample_rates.get(key, 1.0)
+        if rate < 1.0:
+            if random.random() >= rate:
+                return False
+            record.sample_rate = rate
+        if self.rate_limit <= 0 or key in self.exempt:
+            return True
+
+        second = int(time.monotonic())
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or window[0] != second:
+                suppressed = window[2] if window else 0
+                window = self.windows[key] = [second, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if window[1] >= self.rate_limit:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta en vez de bloquear y se reinicia tras un fork"""
+
+    def __init__(self, queue_size):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.pid = None
+        self.listener = None
+        self.fork_lock = threading.Lock()
+
+    def start(self):
+        self.pid = os.getpid()
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, output, respect_handler_level=False)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+
+    def prepare(self, record):
+        # Solo se resuelven los argumentos; el JSON se genera en el listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def restart_after_fork(self):
+        """En el proceso hijo: el hilo del listener no se hereda tras un fork"""
+        with self.fork_lock:
+            if self.pid != os.getpid():
+                self.queue = queue.Queue(self.queue_size)
+                self.start()
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.restart_after_fork()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def restart_logging_after_fork():
+    """Llamar en post_fork de gunicorn, antes de que el worker atienda peticiones"""
+    if _handler is not None:
+        _handler.restart_after_fork()
+
+
+def log_stats():
+    if _handler is None:
+        return {}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
+
+
+def setup_logging(app):
+    """Configura el logger 'api' y registra el log de acceso de la app"""
+    global _handler
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.propagate = False
+    with _handler_lock:
+        if _handler is None:
+            _handler = DroppingQueueHandler(app.config['LOG_QUEUE_SIZE'])
+            _handler.start()
+            logger.addHandler(_handler)
+            atexit.register(_handler.stop)
+        # Primero el muestreo: el contexto solo se calcula para lo que se escribe
+        _handler.filters = [
+            RateLimitFilter(app.config['LOG_SAMPLE_RATES'], app.config['LOG_RATE_LIMIT']),
+            RequestContextFilter(),
+        ]
+
+    @app.before_request
+    def start_request_log():
+        # setdefault: las sub-peticiones de /api/batch comparten `g` con el lote
+        g.setdefault('request_id', request.headers.get(REQUEST_ID_HEADER, '')[:64] or uuid.uuid4().hex)
+        g.setdefault('request_started', time.perf_counter())
+
+    @app.after_request
+    def write_access_log(response):
+        response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('request', extra={'event': 'request', 'status': response.status_code})
+        return response
+
+    return logger
@@ -13,6 +13,9 @@ class User(db.Model):
     phone = db.Column(db.String(20), nullable=True)
     address = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Revisión del carrito: PUT /api/cart la incrementa en cada cambio
+    cart_revision = db.Column(db.Integer, nullable=False,
+                              default=0, server_default='0')
 
     def set_password(self, password):
         self.password = generate_password_hash(password)
@@ -53,12 +56,17 @@ class Product(db.Model):
     stock = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(255), nullable=True)
     category_id = db.Column(db.Integer, db.ForeignKey(
-        'category.id'), nullable=False)
+        'category.id'), nullable=False, index=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Control de concurrencia optimista: cada UPDATE incrementa la versión
+    version = db.Column(db.Integer, nullable=False,
+                        default=1, server_default='1')
 
     category = db.relationship(
         'Category', backref=db.backref('products', lazy=True))
 
+    __mapper_args__ = {'version_id_col': version}
+
     def serialize(self):
         return {
             "id": self.id,
@@ -68,40 +76,160 @@ class Product(db.Model):
             "stock": self.stock,
             "image_url": self.image_url,
             "category_id": self.category_id,
-            "is_active": self.is_active
+            "is_active": self.is_active,
+            "version": self.version
         }
 
 
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'user.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey(
-        'product.id'), nullable=False)
+        'product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
     user = db.relationship('User', backref=db.backref('cart_items', lazy=True))
     product = db.relationship(
         'Product', backref=db.backref('cart_items', lazy=True))
 
+    def serialize(self):
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "product": self.product.serialize() if self.product else None
+        }
+
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'user.id'), nullable=False, index=True)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
-    status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    status = db.Column(db.String(20), default='pending', index=True)
+    created_at = db.Column(
+        db.DateTime, default=db.func.current_timestamp(), index=True)
 
     user = db.relationship('User', backref=db.backref('orders', lazy=True))
 
+    def serialize(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "total_amount": float(self.total_amount),
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "order_items": [item.serialize() for item in self.items],
+            "archived": False
+        }
+
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey(
+        'order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey(
-        'product.id'), nullable=False)
+        'product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
 
     order = db.relationship('Order', backref=db.backref('items', lazy=True))
     product = db.relationship(
         'Product', backref=db.backref('order_items', lazy=True))
+
+    def serialize(self):
+        return serialize_order_item(self, self.product)
+
+
+def serialize_order_item(item, product):
+    return {
+        "id": item.id,
+        "product_id": item.product_id,
+        "quantity": item.quantity,
+        "price": float(item.price),
+        "product": {
+            "id": product.id,
+            "name": product.name,
+            "image_url": product.image_url
+        } if product else None
+    }
+
+
+class RelatedProduct(db.Model):
+    """Productos relacionados precalculados por `flask compute-related`"""
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey(
+        'product.id'), nullable=False, index=True)
+    related_id = db.Column(db.Integer, db.ForeignKey(
+        'product.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    related = db.relationship('Product', foreign_keys=[related_id])
+
+
+class OrderEvent(db.Model):
+    """Registro append-only de cambios de estado de pedidos (lo rellena api.order_events)"""
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey(
+        'order.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    previous_status = db.Column(db.String(20), nullable=True)
+    created_at = db.Column(
+        db.DateTime, default=db.func.current_timestamp(), nullable=False)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "status": self.status,
+            "previous_status": self.previous_status,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ArchivedOrder(db.Model):
+    """
+    Pedidos completados que `flask archive-orders` saca de la tabla order.
+    En Postgres la tabla está particionada por rango de created_at (una
+    partición por año, creada por el propio comando).
+    """
+    __tablename__ = 'order_archive'
+    __table_args__ = (
+        db.Index('ix_order_archive_user_id_created_at', 'user_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    # La clave de partición tiene que formar parte de la clave primaria
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def serialize(self, items):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "total_amount": float(self.total_amount),
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "order_items": items,
+            "archived": True
+        }
+
+
+class ArchivedOrderItem(db.Model):
+    """Líneas de los pedidos archivados; sin claves foráneas, se consultan por order_id"""
+    __tablename__ = 'order_item_archive'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (order_created_at)'}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_created_at = db.Column(db.DateTime, primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -0,0 +1,268 @@
+"""
+Eventos de pedidos en tiempo real: GET /api/orders/stream (server-sent events).
+
+Cada cambio de Order.status hecho con la sesión del ORM (rutas, admin) añade
+una fila a order_event en la misma transacción. En Postgres además se hace
+NOTIFY, que solo se entrega al hacer commit. Los UPDATE masivos sin ORM no
+generan eventos.
+
+Cada worker tiene un único OrderEventBroker con un hilo que lee las filas
+nuevas por id (despertado por LISTEN en Postgres, o sondeando cada
+ORDER_EVENTS_POLL_INTERVAL segundos en otros motores) y las reparte a las
+conexiones SSE abiertas de cada usuario. Las conexiones no usan la base de
+datos mientras esperan.
+
+Funciona con workers gthread o gevent de gunicorn (con gevent, psycopg2
+necesita psycogreen para no bloquear el hub durante las consultas). Con
+gthread cada stream ocupa un hilo del worker durante hasta
+ORDER_STREAM_MAX_SECONDS: ORDER_STREAM_MAX_CONNECTIONS limita los streams
+abiertos por worker (503 al llegar al tope) para que queden hilos libres
+para el resto de peticiones.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from flask import Blueprint, Response, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import event, inspect, select as sql_select, func, text
+from api.models import db, Order, OrderEvent
+
+order_events = Blueprint('order_events', __name__)
+log = logging.getLogger('api')
+
+CHANNEL = 'order_events'
+FETCH_LIMIT = 500
+# Ids por debajo del último leído que se vuelven a mirar: en Postgres un id
+# menor puede hacerse visible después (transacciones que terminan en otro orden)
+LOOKBACK_IDS = 100
+RETRY_MS = 3000
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_status_changes(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            rows.append({'order_id': obj.id, 'user_id': obj.user_id,
+                         'status': obj.status, 'previous_status': None})
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            history = inspect(obj).attrs.status.history
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                rows.append({'order_id': obj.id, 'user_id': obj.user_id,
+                             'status': history.added[0], 'previous_status': history.deleted[0]})
+    if not rows:
+        return
+    connection = session.connection()
+    connection.execute(OrderEvent.__table__.insert(), rows)
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_notify(:channel, \'\')'), {'channel': CHANNEL})
+
+
+def format_event(row):
+    data = {
+        'order_id': row['order_id'],
+        'status': row['status'],
+        'previous_status': row['previous_status'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+    }
+    return f"id: {row['id']}\nevent: order_status\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    def __init__(self, user_id, cursor, queue_size):
+        self.user_id = user_id
+        # Último id que ya estaba leído al suscribirse: lo anterior es backlog
+        self.cursor = cursor
+        self.queue = queue.Queue(queue_size)
+        self.overflowed = False
+
+
+class OrderEventBroker:
+    """Un lector de order_event por proceso que reparte eventos por usuario"""
+
+    def __init__(self, engine, poll_interval, queue_size, max_subscribers):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+        self.count = 0
+        self.last_id = 0
+        self.seen = set()
+        self.thread = None
+
+    def subscribe(self, user_id):
+        """Nuevo Subscriber, o None si el worker ya tiene max_subscribers streams"""
+        with self.lock:
+            if self.count >= self.max_subscribers:
+                return None
+            if self.thread is None:
+                self.last_id = self._max_id()
+                self.thread = threading.Thread(target=self._run, name='order-events', daemon=True)
+                self.thread.start()
+            subscriber = Subscriber(user_id, self.last_id, self.queue_size)
+            self.subscribers[user_id].add(subscriber)
+            self.count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        # Idempotente: se llama al terminar el generador y al cerrar la respuesta
+        with self.lock:
+            subscribers = self.subscribers.get(subscriber.user_id)
+            if subscribers is not None and subscriber in subscribers:
+                subscribers.remove(subscriber)
+                self.count -= 1
+                if not subscribers:
+                    del self.subscribers[subscriber.user_id]
+
+    def _max_id(self):
+        with self.engine.connect() as connection:
+            return connection.scalar(sql_select(func.max(OrderEvent.id))) or 0
+
+    def _run(self):
+        while True:
+            try:
+                if self.engine.dialect.name == 'postgresql':
+                    self._listen()
+                else:
+                    time.sleep(self.poll_interval)
+                    self.fetch()
+            except Exception:
+                log.exception("Order events listener error", extra={'event': 'order_events_error'})
+                time.sleep(self.poll_interval)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self.fetch()
+            while True:
+                # El timeout también recoge eventos de ids que llegaron tarde
+                if select.select([connection], [], [], self.poll_interval * 10)[0]:
+                    connection.poll()
+                    connection.notifies.clear()
+                self.fetch()
+        finally:
+            # Conexión en autocommit con LISTEN activo: no se devuelve al pool
+            raw.invalidate()
+
+    def fetch(self):
+        table = OrderEvent.__table__
+        while True:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    sql_select(table)
+                    .where(table.c.id > self.last_id - LOOKBACK_IDS)
+                    .order_by(table.c.id)
+                    .limit(FETCH_LIMIT + LOOKBACK_IDS)
+                ).mappings().all()
+            rows = [row for row in rows if row['id'] > self.last_id or row['id'] not in self.seen]
+            if rows:
+                self._dispatch(rows)
+            if len(rows) < FETCH_LIMIT:
+                return
+
+    def _dispatch(self, rows):
+        with self.lock:
+            for row in rows:
+                for subscriber in self.subscribers.get(row['user_id'], ()):
+                    if row['id'] <= subscriber.cursor:
+                        continue
+                    try:
+                        subscriber.queue.put_nowait(format_event(row))
+                    except queue.Full:
+                        # Cliente lento: se cierra su stream y reanuda con Last-Event-ID
+                        subscriber.overflowed = True
+                self.seen.add(row['id'])
+            self.last_id = max(self.last_id, rows[-1]['id'])
+            self.seen = {i for i in self.seen if i > self.last_id - LOOKBACK_IDS}
+
+
+def get_broker():
+    app = current_app._get_current_object()
+    broker = app.extensions.get('order_events')
+    if broker is None:
+        with app.extensions.setdefault('order_events_lock', threading.Lock()):
+            broker = app.extensions.get('order_events')
+            if broker is None:
+                broker = app.extensions['order_events'] = OrderEventBroker(
+                    db.engine, app.config['ORDER_EVENTS_POLL_INTERVAL'],
+                    app.config['ORDER_STREAM_QUEUE_SIZE'],
+                    app.config['ORDER_STREAM_MAX_CONNECTIONS'])
+    return broker
+
+
+def _last_event_id():
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@order_events.route('/orders/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_orders():
+    """
+    Stream de cambios de estado de los pedidos del usuario. EventSource no
+    permite cabeceras, así que el token también se acepta como ?jwt=<token>.
+    Al reconectar, el navegador envía Last-Event-ID y se reenvía lo perdido.
+    """
+    user_id = int(get_jwt_identity())
+    resume_from = _last_event_id()
+    config = current_app.config
+    heartbeat = config['ORDER_STREAM_HEARTBEAT']
+    max_seconds = config['ORDER_STREAM_MAX_SECONDS']
+
+    broker = get_broker()
+    subscriber = broker.subscribe(user_id)
+    if subscriber is None:
+        log.warning("Order stream limit reached", extra={'event': 'order_stream_full'})
+        return Response(f"retry: {RETRY_MS}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(RETRY_MS // 1000)})
+    try:
+        backlog = []
+        if resume_from is not None:
+            backlog = [format_event(row) for row in db.session.execute(
+                sql_select(OrderEvent.__table__)
+                .where(OrderEvent.user_id == user_id,
+                       OrderEvent.id > resume_from,
+                       OrderEvent.id <= subscriber.cursor)
+                .order_by(OrderEvent.id)
+            ).mappings()]
+        db.session.close()
+    except Exception:
+        broker.unsubscribe(subscriber)
+        raise
+
+    def generate():
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            yield from backlog
+            # Se corta cada cierto tiempo; el cliente reconecta sin perder eventos
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline and not subscriber.overflowed:
+                try:
+                    yield subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Si la respuesta se cierra sin haber empezado a iterar, el finally del
+    # generador no llega a ejecutarse
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    return response
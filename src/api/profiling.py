@@ -0,0 +1,249 @@
+"""
+Perfilado opcional de peticiones individuales.
+
+Se activa para una petición con la cabecera `X-Profile: <PROFILE_TOKEN>` o con
+`?profile=<PROFILE_TOKEN>`, o para un porcentaje de las peticiones de un
+endpoint con PROFILE_SAMPLE_RATES ('api.get_products=0.05'). Por cada petición
+perfilada se escriben en instance/profiles/:
+
+- <id>.speedscope.json  muestreo de la pila cada PROFILE_INTERVAL_MS (ábrelo en
+                        https://www.speedscope.app), o <id>.prof (pstats) con
+                        `X-Profile-Mode: cprofile`,
+- <id>.sql.json         cronología de las sentencias SQL de la petición.
+
+Sin PROFILE_TOKEN ni PROFILE_SAMPLE_RATES no se registra ningún hook. Con ellos,
+el coste en una petición no perfilada es una búsqueda en un dict.
+Con workers gevent el muestreo no ve los greenlets: usar el modo cprofile.
+Solo puede haber un cProfile activo por proceso (Python 3.12+): si otra
+petición ya lo usa, la nueva se perfila por muestreo y la respuesta lo indica
+con `X-Profile-Mode: sample`.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODE_HEADER = 'X-Profile-Mode'
+MAX_STATEMENT_LENGTH = 2000
+PROFILE_KEY = 'api.profile'
+REQUESTED_KEY = 'api.profile_requested'
+# El request_id viene de la cabecera X-Request-ID del cliente: solo se usa en
+# el nombre del fichero con caracteres seguros
+UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+
+log = logging.getLogger('api')
+
+# Perfiles en curso por hilo: los listeners de SQL solo miran aquí
+_active = {}
+# Desde Python 3.12 un segundo cProfile.enable() en el proceso lanza ValueError
+_cprofile_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """Muestrea la pila de un hilo cada `interval` segundos (formato speedscope)"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.frames = {}
+        self.samples = []
+        self.weights = []
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                self.weights.append(round((now - last) * 1000, 3))
+            last = now
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frames)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def speedscope(self, name):
+        frames = [{'name': name, 'file': file, 'line': line}
+                  for (name, file, line) in self.frames]
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(self.weights), 3),
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+            'name': name,
+            'exporter': 'api.profiling',
+        }
+
+
+class RequestProfile:
+    def __init__(self, mode, interval):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.statements = []
+        self.thread_id = threading.get_ident()
+        if mode == 'cprofile' and self._enable_cprofile():
+            return
+        self.mode = 'sample'
+        self.profiler = StackSampler(self.thread_id, interval)
+        self.profiler.start()
+
+    def _enable_cprofile(self):
+        if not _cprofile_lock.acquire(blocking=False):
+            return False
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Otra herramienta (depurador, sys.monitoring) ya está activa
+            _cprofile_lock.release()
+            return False
+        return True
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+            _cprofile_lock.release()
+        else:
+            self.profiler.stop()
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    def write(self, directory, profile_id, name):
+        if self.mode == 'cprofile':
+            self.profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+        else:
+            with open(os.path.join(directory, f'{profile_id}.speedscope.json'), 'w') as f:
+                json.dump(self.profiler.speedscope(name), f)
+        with open(os.path.join(directory, f'{profile_id}.sql.json'), 'w') as f:
+            json.dump({
+                'request': name,
+                'duration_ms': self.duration_ms,
+                'sql_total_ms': round(sum(s['duration_ms'] for s in self.statements), 3),
+                'statements': self.statements,
+            }, f, indent=1)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get(threading.get_ident())
+    if profile is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get(threading.get_ident())
+    started = getattr(context, '_profile_started', None)
+    if profile is None or started is None:
+        return
+    now = time.perf_counter()
+    profile.statements.append({
+        'start_ms': round((started - profile.started) * 1000, 3),
+        'duration_ms': round((now - started) * 1000, 3),
+        'statement': statement[:MAX_STATEMENT_LENGTH],
+        'executemany': executemany,
+        'rowcount': cursor.rowcount,
+        'database': conn.engine.url.database,
+    })
+
+
+def _stop(profile):
+    _active.pop(profile.thread_id, None)
+    profile.stop()
+
+
+def _requested_mode(token):
+    value = request.headers.get(PROFILE_HEADER) or request.args.get('profile')
+    # En bytes: compare_digest no acepta str con caracteres no ASCII
+    if value and token and hmac.compare_digest(value.encode(), token.encode()):
+        return request.headers.get(PROFILE_MODE_HEADER, 'sample').lower()
+    return None
+
+
+def setup_profiling(app):
+    token = app.config['PROFILE_TOKEN']
+    sample_rates = app.config['PROFILE_SAMPLE_RATES']
+    if not token and not sample_rates:
+        return
+    interval = app.config['PROFILE_INTERVAL_MS'] / 1000
+    directory = os.path.join(app.instance_path, 'profiles')
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_profile():
+        if threading.get_ident() in _active:
+            # Sub-petición de /api/batch dentro de una petición ya perfilada
+            return
+        mode = _requested_mode(token) if token else None
+        if mode is None:
+            rate = sample_rates.get(request.endpoint)
+            if not rate or random.random() >= rate:
+                return
+        else:
+            request.environ[REQUESTED_KEY] = True
+        # En el environ y no en `g`: las sub-peticiones de /api/batch comparten `g`
+        request.environ[PROFILE_KEY] = _active[threading.get_ident()] = \
+            RequestProfile(mode or 'sample', interval)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = request.environ.pop(PROFILE_KEY, None)
+        if profile is None:
+            return response
+        _stop(profile)
+        name = f'{request.method} {request.path}'
+        profile_id = '{}-{}-{}'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S'),
+            (request.endpoint or 'unknown').replace('.', '_'),
+            UNSAFE_ID_CHARS.sub('', g.get('request_id') or '')[:64] or os.urandom(4).hex())
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profile.write(directory, profile_id, name)
+        except OSError:
+            log.exception("Profile write failed", extra={'event': 'profile_error'})
+            return response
+        if request.environ.get(REQUESTED_KEY):
+            response.headers['X-Profile-Id'] = profile_id
+            response.headers[PROFILE_MODE_HEADER] = profile.mode
+        return response
+
+    @app.teardown_request
+    def discard_profile(exception=None):
+        # La petición terminó sin pasar por after_request
+        profile = request.environ.pop(PROFILE_KEY, None)
+        if profile is not None:
+            _stop(profile)
@@ -0,0 +1,131 @@
+"""
+Separación lectura/escritura: rutas de solo lectura contra una réplica opcional.
+
+Si DATABASE_READ_URL está definida, read_session() devuelve una sesión de
+solo lectura ligada a la réplica. Vuelve a la sesión principal (db.session) si:
+- el cliente ha escrito hace menos de REPLICA_STICKY_SECONDS (lee lo que escribe),
+- la petición, o el lote de /api/batch en curso, ya ha escrito,
+- la réplica falló hace menos de REPLICA_RETRY_SECONDS.
+Sin réplica configurada, read_session() es simplemente db.session.
+"""
+import logging
+import time
+from functools import wraps
+from flask import current_app, g, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker, Session
+from api.models import db
+
+log = logging.getLogger('api')
+
+STICKY_COOKIE = 'rw_sticky'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Son POST pero no escriben por sí mismos: /api/batch solo cuenta como
+# escritura si alguna de sus sub-peticiones escribe
+NON_WRITING_ENDPOINTS = ('batch.run_batch',)
+
+
+class ReadOnlySession(Session):
+    pass
+
+
+@event.listens_for(ReadOnlySession, 'before_flush')
+def _reject_writes(session, flush_context, instances):
+    raise RuntimeError("La sesión de réplica es de solo lectura")
+
+
+class Replica:
+    def __init__(self, url, retry_seconds):
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.Session = sessionmaker(bind=self.engine, class_=ReadOnlySession, autoflush=False)
+        self.retry_seconds = retry_seconds
+        self.down_until = 0
+
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + self.retry_seconds
+        log.warning("Read replica unavailable, using primary for %ss", self.retry_seconds,
+                    extra={'event': 'replica_down'})
+
+
+def setup_replica(app):
+    url = app.config.get('DATABASE_READ_URL')
+    if not url:
+        return
+    replica = Replica(url, app.config['REPLICA_RETRY_SECONDS'])
+    app.extensions['replica'] = replica
+
+    @app.after_request
+    def mark_recent_write(response):
+        # Tras una escritura propia, sus lecturas van al primario un rato
+        if (request.method in WRITE_METHODS and response.status_code < 400
+                and request.endpoint not in NON_WRITING_ENDPOINTS):
+            note_write()
+        if wrote_in_request():
+            sticky = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky),
+                                max_age=sticky, httponly=True, samesite='Lax')
+        return response
+
+    @app.teardown_appcontext
+    def close_read_session(exception=None):
+        session = g.pop('read_session', None)
+        if session is not None and session is not db.session:
+            session.close()
+
+
+def _recent_write():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def note_write():
+    """
+    Marca el app context como escrito. Las sub-peticiones de un lote comparten
+    el app context del lote, así que las lecturas posteriores del mismo lote
+    también van al primario.
+    """
+    g.wrote = True
+    session = g.pop('read_session', None)
+    if session is not None and session is not db.session:
+        session.close()
+
+
+def wrote_in_request():
+    return g.get('wrote', False)
+
+
+def read_session():
+    """Sesión para consultas de solo lectura de la petición actual"""
+    if 'read_session' not in g:
+        replica = current_app.extensions.get('replica')
+        if replica is None or not replica.available() or wrote_in_request() or _recent_write():
+            g.read_session = db.session
+        else:
+            g.read_session = replica.Session()
+    return g.read_session
+
+
+def uses_replica(f):
+    """
+    Decorador para rutas de solo lectura: si la réplica falla durante la
+    petición, se marca como caída y la ruta se repite contra el primario.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except DBAPIError:
+            session = g.get('read_session')
+            if session is None or session is db.session:
+                raise
+            session.close()
+            current_app.extensions['replica'].mark_down()
+            g.read_session = db.session
+            return f(*args, **kwargs)
+    return decorated_function
@@ -1,13 +1,32 @@
 """
 API endpoints for AMS Crochet
 """
+import logging
+from datetime import datetime
+from decimal import Decimal
 from flask import Blueprint, request, jsonify
-from api.models import db, User, Product, Category, CartItem, Order, OrderItem
+from sqlalchemy import update, select, delete, case, and_, or_
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from api.models import db, User, Product, Category, CartItem, Order, OrderItem, RelatedProduct
 from api.utils import generate_sitemap, APIException
+from api.validators import validate_json, validate_product, validate_register, validate_batch
+from api.replica import read_session, uses_replica
+from api.catalog import get_product_detail, invalidate_products
+from api.archive import archived_orders, archived_order, before_cursor
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import check_password_hash, generate_password_hash
 
 api = Blueprint('api', __name__)
+log = logging.getLogger('api')
+
+# Columnas que se pueden modificar con PATCH (los valores llegan ya validados
+# y convertidos por PRODUCT_SCHEMA)
+PRODUCT_PATCH_FIELDS = ('name', 'description', 'price', 'stock', 'category_id',
+                        'image_url', 'is_active')
+BULK_PATCH_FIELDS = ('id', 'version', 'price', 'stock')
+MAX_BULK_PRODUCTS = 1000
+MAX_CART_ITEMS = 100
 
 # Auth endpoints
 
@@ -24,6 +43,7 @@ def login():
 
         user = User.query.filter_by(email=email).first()
         if not user or not check_password_hash(user.password, password):
+            log.warning("Login failed", extra={'event': 'login_failed'})
             return jsonify({"error": "Invalid credentials"}), 401
 
         access_token = create_access_token(identity=str(user.id))
@@ -36,18 +56,15 @@ def login():
             }
         }), 200
 
-    except Exception as e:
-        print(f"LOGIN ERROR: {e}")
+    except Exception:
+        log.exception("Login error", extra={'event': 'login_error'})
         return jsonify({"error": "Login failed"}), 500
 
 
 @api.route('/register', methods=['POST'])
-def register():
+@validate_json(validate_register)
+def register(data):
     try:
-        data = request.get_json()
-        if not data or 'email' not in data or 'password' not in data:
-            return jsonify({"error": "Email and password are required"}), 400
-
         email = data['email']
         password = data['password']
 
@@ -70,22 +87,42 @@ def register():
             }
         }), 201
 
-    except Exception as e:
-        print(f"Register error: {e}")
+    except Exception:
+        log.exception("Register error", extra={'event': 'register_error'})
         db.session.rollback()
         return jsonify({"error": "Registration failed"}), 500
 
 
 # CRUD para Product
 @api.route('/products', methods=['GET'])
+@uses_replica
 def get_products():
-    products = Product.query.all()
+    products = read_session().scalars(select(Product)).all()
     return jsonify([product.serialize() for product in products]), 200
 
 
+@api.route('/products/<int:id>', methods=['GET'])
+@uses_replica
+def get_product(id):
+    """Ficha de producto con su categoría y productos relacionados (cacheada)"""
+    detail = get_product_detail(read_session(), id)
+    if detail is None:
+        return jsonify({'error': 'Producto no encontrado'}), 404
+    response = jsonify(detail)
+    response.headers['ETag'] = etag(detail['version'])
+    return response, 200
+
+
+@api.route('/categories', methods=['GET'])
+@uses_replica
+def get_categories():
+    categories = read_session().scalars(select(Category).order_by(Category.id)).all()
+    return jsonify([category.serialize() for category in categories]), 200
+
+
 @api.route('/products', methods=['POST'])
-def create_product():
-    data = request.get_json()
+@validate_json(validate_product)
+def create_product(data):
     product = Product(
         name=data.get('name'),
         description=data.get('description'),
@@ -93,27 +130,171 @@ def create_product():
         stock=data.get('stock'),
         category_id=data.get('category_id'),
         image_url=data.get('image_url'),
-        is_active=True
+        is_active=data.get('is_active', True)
     )
     db.session.add(product)
     db.session.commit()
+    invalidate_products([product.id])
     return jsonify(product.serialize()), 201
 
 
 @api.route('/products/<int:id>', methods=['PUT'])
-def update_product(id):
+@validate_json(validate_product, partial=True)
+def update_product(id, data):
     product = Product.query.get(id)
     if not product:
         return jsonify({'error': 'Producto no encontrado'}), 404
-    data = request.get_json()
+    # If-Match (o el campo version) es opcional; si se envía tiene que coincidir
+    version = expected_version(data)
+    if version is not None and version != product.version:
+        return version_conflict(product.version)
     product.name = data.get('name', product.name)
     product.description = data.get('description', product.description)
     product.price = data.get('price', product.price)
     product.stock = data.get('stock', product.stock)
     product.category_id = data.get('category_id', product.category_id)
     product.image_url = data.get('image_url', product.image_url)
+    product.is_active = data.get('is_active', product.is_active)
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return version_conflict(db.session.scalar(select(Product.version).where(Product.id == id)))
+    invalidate_products([id])
+    response = jsonify(product.serialize())
+    response.headers['ETag'] = etag(product.version)
+    return response, 200
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def version_conflict(current):
+    response = jsonify({'error': 'El producto fue modificado por otro usuario',
+                        'version': current})
+    response.headers['ETag'] = etag(current)
+    return response, 409
+
+
+def expected_version(data, field='version'):
+    """Versión esperada por el cliente: cabecera If-Match (ETag) o el campo `field`"""
+    etags = request.if_match.as_set()
+    value = next(iter(etags)) if len(etags) == 1 else data.get(field)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@api.route('/products/<int:id>', methods=['PATCH'])
+@validate_json(validate_product, partial=True)
+def patch_product(id, data):
+    """
+    Actualización parcial sin cargar el producto: un único
+    UPDATE ... WHERE id = :id AND version = :v con solo las columnas enviadas.
+    """
+    version = expected_version(data)
+    if version is None:
+        return jsonify({'error': 'Se requiere la versión (If-Match o campo version)'}), 428
+
+    changes = {field: data[field] for field in PRODUCT_PATCH_FIELDS if field in data}
+    if not changes:
+        return jsonify({'error': 'No hay campos para actualizar'}), 400
+
+    values = dict(changes)
+    if 'price' in values:
+        values['price'] = Decimal(str(values['price']))
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == id, Product.version == version)
+        .values(**values, version=Product.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        current = db.session.scalar(select(Product.version).where(Product.id == id))
+        if current is None:
+            return jsonify({'error': 'Producto no encontrado'}), 404
+        return version_conflict(current)
+
+    db.session.commit()
+    invalidate_products([id])
+    response = jsonify({'id': id, 'version': version + 1, **changes})
+    response.headers['ETag'] = etag(version + 1)
+    return response, 200
+
+
+@api.route('/products', methods=['PATCH'])
+def bulk_patch_products():
+    """
+    Cambios masivos de precio/stock en una sola sentencia:
+    {"products": [{"id": 1, "version": 3, "price": 10.5, "stock": 4}, ...]}
+
+    "version" es opcional por producto. Si alguna versión no coincide no se
+    aplica ningún cambio y se devuelve 409 con los conflictos.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('products')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': "Se requiere una lista 'products'"}), 400
+    if len(items) > MAX_BULK_PRODUCTS:
+        return jsonify({'error': f'Máximo {MAX_BULK_PRODUCTS} productos por petición'}), 400
+    for item in items:
+        if not isinstance(item, dict) or type(item.get('id')) is not int:
+            return jsonify({'error': "Cada producto necesita un 'id' entero"}), 400
+        if set(item) - set(BULK_PATCH_FIELDS):
+            return jsonify({'error': 'Solo se pueden modificar price y stock'}), 400
+    ids = [item['id'] for item in items]
+    if len(set(ids)) != len(ids):
+        return jsonify({'error': 'Productos repetidos en la petición'}), 400
+
+    rows = []
+    report = validate_batch(validate_product, items, partial=True, out=rows)
+    if report['invalid_rows']:
+        return jsonify({'error': 'Datos inválidos', 'errors': report['errors']}), 400
+    for item, row in zip(items, rows):
+        row['id'] = item['id']
+    items = rows
+
+    prices = {item['id']: Decimal(str(item['price'])) for item in items if 'price' in item}
+    stocks = {item['id']: item['stock'] for item in items if 'stock' in item}
+    if not prices and not stocks:
+        return jsonify({'error': 'No hay campos para actualizar'}), 400
+
+    versions = {item['id']: item['version'] for item in items if 'version' in item}
+    values = {'version': Product.version + 1}
+    if prices:
+        values['price'] = case(prices, value=Product.id, else_=Product.price)
+    if stocks:
+        values['stock'] = case(stocks, value=Product.id, else_=Product.stock)
+    # IN + CASE en vez de un OR por producto: SQLite rechaza árboles de
+    # expresiones de más de 1000 niveles ("Expression tree is too large")
+    condition = Product.id.in_(ids)
+    if versions:
+        condition = and_(condition, Product.version == case(versions, value=Product.id,
+                                                              else_=Product.version))
+
+    result = db.session.execute(
+        update(Product)
+        .where(condition)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(items):
+        db.session.rollback()
+        current = dict(db.session.execute(
+            select(Product.id, Product.version).where(Product.id.in_(ids))).all())
+        conflicts = [
+            {'id': item['id'], 'version': current.get(item['id'])}
+            for item in items
+            if item['id'] not in current or item.get('version', current[item['id']]) != current[item['id']]
+        ]
+        return jsonify({'error': 'Conflicto de versiones', 'conflicts': conflicts}), 409
+
     db.session.commit()
-    return jsonify(product.serialize()), 200
+    invalidate_products(ids)
+    return jsonify({'updated': len(items)}), 200
 
 
 @api.route('/products/<int:id>', methods=['DELETE'])
@@ -121,10 +302,215 @@ def delete_product(id):
     product = Product.query.get(id)
     if not product:
         return jsonify({'error': 'Producto no encontrado'}), 404
+    db.session.execute(delete(RelatedProduct).where(
+        or_(RelatedProduct.product_id == id, RelatedProduct.related_id == id)))
     db.session.delete(product)
     db.session.commit()
+    invalidate_products([id])
     return jsonify({'result': 'Producto eliminado'}), 200
 
+# Carrito
+
+
+def cart_items(user_id):
+    return CartItem.query.options(joinedload(CartItem.product)) \
+        .filter_by(user_id=user_id).order_by(CartItem.id).all()
+
+
+def cart_response(revision, items, status=200):
+    response = jsonify({'revision': revision, 'items': [item.serialize() for item in items]})
+    response.headers['ETag'] = etag(revision)
+    return response, status
+
+
+def parse_cart(items):
+    """{product_id: quantity} del carrito deseado, o un mensaje de error"""
+    if not isinstance(items, list):
+        return None, "Se requiere una lista 'items'"
+    if len(items) > MAX_CART_ITEMS:
+        return None, f'Máximo {MAX_CART_ITEMS} productos en el carrito'
+    desired = {}
+    for item in items:
+        if not isinstance(item, dict):
+            return None, "Cada producto necesita 'product_id' y 'quantity'"
+        product_id, quantity = item.get('product_id'), item.get('quantity')
+        if type(product_id) is not int or type(quantity) is not int or quantity < 0:
+            return None, "Cada producto necesita 'product_id' y 'quantity' enteros"
+        if product_id in desired:
+            return None, 'Productos repetidos en el carrito'
+        if quantity:
+            desired[product_id] = quantity
+    return desired, None
+
+
+@api.route('/cart', methods=['GET'])
+@jwt_required()
+def get_cart():
+    """Líneas del carrito; la revisión actual va en la cabecera ETag"""
+    user_id = int(get_jwt_identity())
+    revision = db.session.scalar(select(User.cart_revision).where(User.id == user_id))
+    if revision is None:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    response = jsonify([item.serialize() for item in cart_items(user_id)])
+    response.headers['ETag'] = etag(revision)
+    return response, 200
+
+
+@api.route('/cart', methods=['PUT'])
+@jwt_required()
+def sync_cart():
+    """
+    Sincroniza el carrito completo en una sola petición:
+    {"revision": 3, "items": [{"product_id": 1, "quantity": 2}, ...]}
+
+    Se calcula la diferencia con las líneas guardadas y se aplica con un
+    DELETE, un UPDATE y un INSERT como mucho, en una transacción. Si no hay
+    cambios no se escribe nada. Si la revisión no coincide se devuelve 409 con
+    el carrito actual para que el cliente lo combine y reintente.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    desired, error = parse_cart(data.get('items'))
+    if error:
+        return jsonify({'error': error}), 400
+    revision = expected_version(data, 'revision')
+    if revision is None:
+        return jsonify({'error': 'Se requiere la revisión (If-Match o campo revision)'}), 428
+
+    current_revision = db.session.scalar(select(User.cart_revision).where(User.id == user_id))
+    if current_revision is None:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    if current_revision != revision:
+        return cart_response(current_revision, cart_items(user_id), 409)
+
+    stored = {}
+    to_delete = []
+    for item_id, product_id, quantity in db.session.execute(
+            select(CartItem.id, CartItem.product_id, CartItem.quantity)
+            .where(CartItem.user_id == user_id).order_by(CartItem.id)):
+        if product_id in stored or product_id not in desired:
+            to_delete.append(item_id)
+        else:
+            stored[product_id] = (item_id, quantity)
+    to_update = {item_id: desired[product_id]
+                 for product_id, (item_id, quantity) in stored.items()
+                 if desired[product_id] != quantity}
+    to_insert = [product_id for product_id in desired if product_id not in stored]
+
+    if not (to_delete or to_update or to_insert):
+        return cart_response(revision, cart_items(user_id))
+
+    if to_insert:
+        found = set(db.session.scalars(select(Product.id).where(
+            Product.id.in_(to_insert), Product.is_active.is_(True))))
+        missing = [product_id for product_id in to_insert if product_id not in found]
+        if missing:
+            return jsonify({'error': 'Productos no disponibles', 'product_ids': missing}), 400
+
+    # El UPDATE de la revisión bloquea la fila del usuario y detecta carreras
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.cart_revision == revision)
+        .values(cart_revision=User.cart_revision + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        current_revision = db.session.scalar(select(User.cart_revision).where(User.id == user_id))
+        return cart_response(current_revision, cart_items(user_id), 409)
+
+    if to_delete:
+        db.session.execute(delete(CartItem).where(CartItem.id.in_(to_delete)))
+    if to_update:
+        db.session.execute(
+            update(CartItem)
+            .where(CartItem.id.in_(list(to_update)))
+            .values(quantity=case(to_update, value=CartItem.id))
+            .execution_options(synchronize_session=False)
+        )
+    if to_insert:
+        db.session.execute(CartItem.__table__.insert(), [
+            {'user_id': user_id, 'product_id': product_id, 'quantity': desired[product_id]}
+            for product_id in to_insert])
+    db.session.commit()
+    return cart_response(revision + 1, cart_items(user_id))
+
+
+# Pedidos
+MAX_ORDERS = 100
+
+
+def order_cursor(order):
+    return datetime.fromisoformat(order['created_at']), order['id']
+
+
+def parse_order_cursor(value):
+    """'<created_at ISO>,<id>' -> (datetime, id), o None si no es válido"""
+    created_at, _, order_id = value.rpartition(',')
+    try:
+        return datetime.fromisoformat(created_at), int(order_id)
+    except ValueError:
+        return None
+
+
+@api.route('/orders', methods=['GET'])
+@jwt_required()
+@uses_replica
+def get_orders():
+    """
+    Pedidos del usuario, del más reciente al más antiguo por (created_at, id).
+    Los archivados por `flask archive-orders` solo se mezclan con
+    ?include_archived=1. Si puede haber más, la cabecera X-Next-Cursor trae el
+    valor de ?before= para la página siguiente.
+    """
+    user_id = int(get_jwt_identity())
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_ORDERS)
+    cursor = None
+    if request.args.get('before'):
+        cursor = parse_order_cursor(request.args['before'])
+        if cursor is None:
+            return jsonify({'error': 'Cursor inválido'}), 400
+
+    session = read_session()
+    query = select(Order).where(Order.user_id == user_id)
+    if cursor is not None:
+        query = query.where(before_cursor(Order.created_at, Order.id, cursor))
+    orders = session.scalars(
+        query.order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+    ).all()
+    result = [order.serialize() for order in orders]
+    if request.args.get('include_archived', '').lower() in ('1', 'true'):
+        # Cada tabla aporta como mucho `limit`; la página son los `limit` más recientes
+        result.extend(archived_orders(session, user_id, limit, cursor))
+        result.sort(key=order_cursor, reverse=True)
+        del result[limit:]
+
+    response = jsonify(result)
+    if len(result) == limit:
+        created_at, order_id = order_cursor(result[-1])
+        response.headers['X-Next-Cursor'] = f'{created_at.isoformat()},{order_id}'
+    return response, 200
+
+
+@api.route('/orders/<int:id>', methods=['GET'])
+@jwt_required()
+@uses_replica
+def get_order(id):
+    user_id = int(get_jwt_identity())
+    session = read_session()
+    order = session.scalar(
+        select(Order)
+        .where(Order.id == id, Order.user_id == user_id)
+        .options(selectinload(Order.items).joinedload(OrderItem.product)))
+    if order is not None:
+        return jsonify(order.serialize()), 200
+    archived = archived_order(session, user_id, id)
+    if archived is None:
+        return jsonify({'error': 'Pedido no encontrado'}), 404
+    return jsonify(archived), 200
+
 # Test endpoint
 
 
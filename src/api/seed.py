@@ -0,0 +1,264 @@
+"""
+Generador de datos sintéticos para pruebas de carga (`flask seed --scale N`).
+
+Todo es determinista a partir de la semilla: cada bloque de BLOCK_SIZE filas usa
+su propio random.Random(seed, tabla, bloque), así que el resultado es idéntico
+con 1 o N procesos y con cualquier --chunk-size. La popularidad de los
+productos sigue una ley de Zipf.
+"""
+import bisect
+import random
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from api.models import db, User, Category, Product, CartItem, Order, OrderItem
+
+# Tamaños por unidad de escala
+USERS_PER_SCALE = 10000
+PRODUCTS_PER_SCALE = 1000
+ORDERS_PER_SCALE = 20000
+CART_USER_RATIO = 0.2
+ZIPF_EXPONENT = 1.1
+# Filas por generador aleatorio; los chunks de inserción son múltiplos de esto
+BLOCK_SIZE = 1000
+
+# Fecha fija (no now()) para que los datos sean reproducibles
+BASE_DATE = datetime(2024, 1, 1)
+ORDER_SPAN_DAYS = 730
+# Hash precalculado de '123456' compartido por todos los usuarios sintéticos:
+# evita un hash por usuario y, al ser fijo, mantiene el dataset reproducible
+SEED_PASSWORD_HASH = ('pbkdf2:sha256:600000$OSD5PGqBCwlIXqzQ$'
+                      '868794c28e416458480fa2266421ed887ab033c9d5efdd9a26cbbe89284d7ac3')
+
+CATEGORIES = [
+    ('Amigurumis', 'Muñecos y figuras tejidas a crochet'),
+    ('Ropa', 'Prendas de vestir hechas a crochet'),
+    ('Accesorios', 'Bolsos, carteras y accesorios'),
+    ('Decoración', 'Elementos decorativos para el hogar'),
+    ('Bebés', 'Mantas, patucos y sonajeros'),
+    ('Mascotas', 'Camas y jerseys para mascotas'),
+    ('Cocina', 'Agarradores, salvamanteles y paños'),
+    ('Navidad', 'Adornos y calcetines navideños'),
+]
+FIRST_NAMES = ['Ana', 'Lucía', 'María', 'Carmen', 'Sofía', 'Laura', 'Elena', 'Paula',
+               'Javier', 'Carlos', 'Alejandro', 'David', 'Pablo', 'Daniel', 'Sergio', 'Jorge']
+LAST_NAMES = ['García', 'Martínez', 'López', 'Sánchez', 'Pérez', 'Gómez', 'Martín',
+              'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Álvarez', 'Romero']
+CITIES = ['Madrid', 'Barcelona', 'Valencia', 'Sevilla', 'Zaragoza', 'Málaga', 'Bilbao']
+ITEMS = ['Osito', 'Bufanda', 'Gorro', 'Bolso', 'Cojín', 'Alfombra', 'Cesta', 'Manta',
+         'Muñeca', 'Unicornio', 'Portavasos', 'Llavero', 'Chal', 'Mitones', 'Conejito']
+ADJECTIVES = ['Clásico', 'Mágico', 'Suave', 'Rústico', 'Boho', 'Mini', 'XL', 'Vintage']
+COLORS = ['Rosa', 'Azul', 'Multicolor', 'Beige', 'Verde', 'Mostaza', 'Gris', 'Lila']
+ORDER_STATUSES = ['pending', 'paid', 'shipped', 'delivered', 'cancelled']
+ORDER_STATUS_WEIGHTS = [5, 5, 10, 75, 5]
+IMAGE_URL = 'https://images.unsplash.com/photo-1529927066849-79b791a69825?ixlib=rb-4.0.3&w=500'
+
+# Estado por proceso, preparado por _init_worker()
+_state = {}
+
+
+def _rng(seed, table, block):
+    return random.Random(f'{seed}:{table}:{block}')
+
+
+def product_price(seed, product_id):
+    """Precio determinista de un producto, usado también por los pedidos"""
+    return round(_rng(seed, 'price', product_id).uniform(5, 80), 2)
+
+
+def _init_worker(seed, first_product_id, product_count):
+    """Tabla acumulada de Zipf + permutación para que los populares no sean los primeros ids"""
+    ranks = list(range(first_product_id, first_product_id + product_count))
+    random.Random(f'{seed}:popularity').shuffle(ranks)
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, product_count + 1):
+        total += 1.0 / rank ** ZIPF_EXPONENT
+        cum_weights.append(total)
+    _state.update(seed=seed, products_by_rank=ranks, cum_weights=cum_weights,
+                  prices={pid: product_price(seed, pid) for pid in ranks})
+
+
+def _popular_product(rng):
+    weights = _state['cum_weights']
+    index = bisect.bisect_left(weights, rng.random() * weights[-1])
+    return _state['products_by_rank'][min(index, len(weights) - 1)]
+
+
+def generate_users(task):
+    seed, block, start_id, count, password = task
+    rng = _rng(seed, 'user', block)
+    rows = []
+    for user_id in range(start_id, start_id + count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        rows.append({
+            'id': user_id,
+            'email': f'{first_name.lower()}.{user_id}@seed.test',
+            'password': password,
+            'first_name': first_name,
+            'last_name': last_name,
+            'phone': f'6{rng.randrange(10 ** 8):08d}',
+            'address': f'Calle {rng.choice(LAST_NAMES)} {rng.randint(1, 200)}, {rng.choice(CITIES)}',
+            'is_active': rng.random() > 0.02,
+        })
+    return rows
+
+
+def generate_products(task):
+    seed, block, start_id, count, category_ids = task
+    rng = _rng(seed, 'product', block)
+    rows = []
+    for product_id in range(start_id, start_id + count):
+        item = rng.choice(ITEMS)
+        rows.append({
+            'id': product_id,
+            'name': f'{item} {rng.choice(ADJECTIVES)} {rng.choice(COLORS)}',
+            'description': f'{item} tejido a mano con hilo de algodón. Referencia {product_id}.',
+            'price': product_price(seed, product_id),
+            'stock': rng.randint(0, 50),
+            'image_url': IMAGE_URL,
+            'category_id': rng.choice(category_ids),
+            'is_active': rng.random() > 0.05,
+        })
+    return rows
+
+
+def generate_orders(task):
+    seed, block, start_id, count, first_user_id, user_count = task
+    rng = _rng(seed, 'order', block)
+    prices = _state['prices']
+    orders, items = [], []
+    for order_id in range(start_id, start_id + count):
+        total = 0
+        for product_id in {_popular_product(rng) for _ in range(rng.randint(1, 5))}:
+            quantity = rng.randint(1, 3)
+            total += prices[product_id] * quantity
+            items.append({'order_id': order_id, 'product_id': product_id,
+                          'quantity': quantity, 'price': prices[product_id]})
+        orders.append({
+            'id': order_id,
+            'user_id': first_user_id + rng.randrange(user_count),
+            'total_amount': round(total, 2),
+            'status': rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+            'created_at': BASE_DATE + timedelta(seconds=rng.randrange(ORDER_SPAN_DAYS * 86400)),
+        })
+    return orders, items
+
+
+def generate_cart_items(task):
+    seed, block, start_user, count = task
+    rng = _rng(seed, 'cart', block)
+    rows = []
+    for user_id in range(start_user, start_user + count):
+        if rng.random() >= CART_USER_RATIO:
+            continue
+        for product_id in {_popular_product(rng) for _ in range(rng.randint(1, 4))}:
+            rows.append({'user_id': user_id, 'product_id': product_id,
+                         'quantity': rng.randint(1, 3)})
+    return rows
+
+
+def _blocks(seed, start_id, total, *extra):
+    """Una tarea por bloque; se agrupan después en chunks de inserción"""
+    return [(seed, offset // BLOCK_SIZE, start_id + offset, min(BLOCK_SIZE, total - offset)) + extra
+            for offset in range(0, total, BLOCK_SIZE)]
+
+
+def _grouped(results, chunk_size):
+    """Concatena resultados de bloques consecutivos hasta ~chunk_size filas"""
+    pending = []
+    for rows in results:
+        pending.extend(rows)
+        if len(pending) >= chunk_size:
+            yield pending
+            pending = []
+    if pending:
+        yield pending
+
+
+def _grouped_orders(results, chunk_size):
+    orders, items = [], []
+    for block_orders, block_items in results:
+        orders.extend(block_orders)
+        items.extend(block_items)
+        if len(orders) >= chunk_size:
+            yield orders, items
+            orders, items = [], []
+    if orders:
+        yield orders, items
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _bulk_insert(model, batches, echo):
+    inserted = 0
+    for rows in batches:
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+            db.session.commit()
+            inserted += len(rows)
+    echo(f"✅ {model.__tablename__}: {inserted} rows")
+    return inserted
+
+
+def _sync_sequences():
+    # En Postgres los ids explícitos no avanzan la secuencia del serial
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in (User, Category, Product, Order):
+        table = model.__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"))
+    db.session.commit()
+
+
+def run_seed(scale, seed=42, workers=1, chunk_size=5000, echo=print):
+    """Genera e inserta el dataset de escala `scale` en la base de datos actual"""
+    user_count = max(1, int(USERS_PER_SCALE * scale))
+    product_count = max(1, int(PRODUCTS_PER_SCALE * scale))
+    order_count = int(ORDERS_PER_SCALE * scale)
+
+    first_category_id = _next_id(Category)
+    categories = [{'id': first_category_id + i, 'name': name, 'description': description}
+                  for i, (name, description) in enumerate(CATEGORIES)]
+    _bulk_insert(Category, [categories], echo)
+    category_ids = [row['id'] for row in categories]
+
+    first_user_id = _next_id(User)
+    first_product_id = _next_id(Product)
+    first_order_id = _next_id(Order)
+
+    init_args = (seed, first_product_id, product_count)
+    pool = Pool(workers, initializer=_init_worker, initargs=init_args) if workers > 1 else None
+    if pool is None:
+        _init_worker(*init_args)
+    imap = pool.imap if pool else map
+
+    try:
+        _bulk_insert(User, _grouped(imap(generate_users, _blocks(
+            seed, first_user_id, user_count, SEED_PASSWORD_HASH)), chunk_size), echo)
+        _bulk_insert(Product, _grouped(imap(generate_products, _blocks(
+            seed, first_product_id, product_count, category_ids)), chunk_size), echo)
+
+        # Cada chunk de pedidos se inserta junto con sus líneas
+        order_total = item_total = 0
+        for orders, items in _grouped_orders(imap(generate_orders, _blocks(
+                seed, first_order_id, order_count, first_user_id, user_count)), chunk_size):
+            db.session.execute(Order.__table__.insert(), orders)
+            db.session.execute(OrderItem.__table__.insert(), items)
+            db.session.commit()
+            order_total += len(orders)
+            item_total += len(items)
+        echo(f"✅ order: {order_total} rows, order_item: {item_total} rows")
+
+        _bulk_insert(CartItem, _grouped(imap(generate_cart_items, _blocks(
+            seed, first_user_id, user_count)), chunk_size), echo)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    _sync_sequences()
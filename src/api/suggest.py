@@ -0,0 +1,327 @@
+"""
+Autocompletado del buscador: GET /api/products/suggest?q=
+
+Índice en memoria sin consultas a la base de datos por petición:
+- vocabulario ordenado de palabras sin acentos ni mayúsculas (bisect por prefijo),
+- por palabra, los productos que la contienen como array de rangos de
+  popularidad (unidades vendidas en OrderItem), de modo que mezclar las listas
+  con heapq.merge da los candidatos ya ordenados del más al menos vendido,
+- los prefijos de 1-2 letras tienen su top precalculado (abarcan demasiadas palabras).
+
+Los cambios de productos (invalidate_products) ocultan al momento los
+productos afectados y despiertan un hilo de refresco por proceso, que vuelve a
+leerlos sobre una capa de cambios pequeña; cuando crece se reconstruye el
+índice. Cada SUGGEST_REFRESH_SECONDS el mismo hilo compara (id, version) con la
+base de datos para recoger lo que hayan escrito otros workers.
+
+Con gunicorn --preload el índice se construye en el maestro (wsgi.py) y los
+workers lo heredan; gc.freeze() en gunicorn.conf.py evita que el recolector
+toque esas páginas y rompa el copy-on-write.
+"""
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import select, func
+from api.models import db, Product, Category, OrderItem
+
+suggest = Blueprint('suggest', __name__)
+log = logging.getLogger('api')
+
+SHORT_PREFIX = 2
+SHORT_TOP = 50
+MAX_WORDS_SCANNED = 300
+MAX_CANDIDATES = 500
+MAX_LIMIT = 20
+MAX_OVERLAY = 500
+
+
+def fold(text):
+    """'Cojín Mágico' -> 'cojin magico'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    chars = [c.lower() if c.isalnum() else ' ' for c in decomposed if not unicodedata.combining(c)]
+    return ' '.join(''.join(chars).split())
+
+
+def _matches(words, tokens):
+    """Cada token es prefijo de alguna palabra"""
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+
+class SuggestIndex:
+    """Índice inmutable; se sustituye entero al reconstruir"""
+
+    def __init__(self, rows, categories, weights):
+        # rows: (id, name, price, image_url, category_id, version)
+        rows = sorted(rows, key=lambda row: (-weights.get(row[0], 0), row[1], row[0]))
+        self.entries = [(row[0], row[1], float(row[2]), row[3], row[4]) for row in rows]
+        # Palabras internadas: los nombres repiten mucho vocabulario
+        self.words = [tuple({sys.intern(word) for word in fold(row[1]).split()}) for row in rows]
+        self.weights = array('i', (weights.get(row[0], 0) for row in rows))
+        self.versions = array('i', (row[5] for row in rows))
+        self.positions = {row[0]: rank for rank, row in enumerate(rows)}
+
+        postings = defaultdict(lambda: array('i'))
+        for rank, words in enumerate(self.words):
+            for word in words:
+                postings[word].append(rank)
+        self.vocabulary = sorted(postings)
+        self.postings = [postings[word] for word in self.vocabulary]
+
+        top = defaultdict(list)
+        for rank, words in enumerate(self.words):
+            for prefix in {word[:length] for word in words for length in range(1, SHORT_PREFIX + 1)}:
+                if len(top[prefix]) < SHORT_TOP:
+                    top[prefix].append(rank)
+        self.short_top = {prefix: array('i', ranks) for prefix, ranks in top.items()}
+
+        self.categories = sorted((fold(name).split(), category_id, name) for category_id, name in categories)
+
+    def postings_for(self, prefix):
+        """Listas de rangos de las palabras del vocabulario que empiezan por `prefix`"""
+        start = bisect_left(self.vocabulary, prefix)
+        lists = []
+        for index in range(start, min(start + MAX_WORDS_SCANNED, len(self.vocabulary))):
+            if not self.vocabulary[index].startswith(prefix):
+                break
+            lists.append(self.postings[index])
+        return lists
+
+    def ranks(self, tokens):
+        """
+        Rangos candidatos (del más vendido al menos). Se recorre el token con
+        menos productos; los prefijos de 1-2 letras usan su top precalculado.
+        """
+        best = None
+        for token in tokens:
+            if len(token) > SHORT_PREFIX:
+                lists = self.postings_for(token)
+                size = sum(map(len, lists))
+                if best is None or size < best[0]:
+                    best = (size, token, lists)
+        if best is None:
+            return max(tokens, key=len), iter(self.short_top.get(max(tokens, key=len), ()))
+        _, token, lists = best
+        if len(lists) == 1:
+            return token, iter(lists[0])
+        return token, heapq.merge(*lists)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Suggester:
+    """Índice actual + capa de cambios, con refresco en un único hilo por proceso"""
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self.index = None
+        # id -> (entry, words, weight, version), o None si el producto ya no se sugiere
+        self.overlay = {}
+        self.dirty = set()
+        self.stale = False
+        self.checked_at = 0
+        # Reentrante: la primera construcción (query) llama a rebuild() con él tomado
+        self.lock = threading.RLock()
+        # Hilo de refresco: espera a `wake` o a que toque la comprobación periódica
+        self.wake = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.thread = None
+        self.pid = None
+
+    def changed(self, app, product_ids):
+        with self.lock:
+            if product_ids is None:
+                self.stale = True
+            else:
+                self.dirty.update(product_ids)
+                if self.index is not None:
+                    # Fuera del índice hasta que el hilo los vuelva a leer: ni
+                    # borrados ni nombres antiguos llegan a la siguiente consulta
+                    self.overlay = {**self.overlay, **dict.fromkeys(product_ids)}
+            self.idle.clear()
+        self._start_refresher(app)
+        self.wake.set()
+
+    def wait(self, timeout=None):
+        """Espera a que se apliquen los cambios pendientes (tests y benchmarks)"""
+        return self.idle.wait(timeout)
+
+    def query(self, app, text, limit):
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    with app.app_context():
+                        self.rebuild()
+        if time.monotonic() - self.checked_at >= self.refresh_seconds:
+            self._start_refresher(app)
+
+        tokens = fold(text).split()
+        if not tokens:
+            return [], []
+        index, overlay = self.index, self.overlay
+        driver, ranks = index.ranks(tokens)
+        others = [token for token in tokens if token is not driver]
+
+        products = []
+        for position, rank in enumerate(ranks):
+            if len(products) >= limit or position >= MAX_CANDIDATES:
+                break
+            entry = index.entries[rank]
+            if entry[0] in overlay or (others and not _matches(index.words[rank], others)):
+                continue
+            products.append((index.weights[rank], entry))
+        for product_id, change in overlay.items():
+            if change is not None and _matches(change[1], tokens):
+                products.append((change[2], change[0]))
+        products.sort(key=lambda item: (-item[0], item[1][1]))
+
+        categories = [(category_id, name) for words, category_id, name in index.categories
+                      if _matches(words, tokens)]
+        return [entry for _, entry in products[:limit]], categories[:3]
+
+    def _start_refresher(self, app):
+        # Un hilo por proceso; tras el fork de gunicorn el del maestro no existe
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, args=(app,), name='suggest-refresh',
+                                           daemon=True)
+            self.thread.start()
+
+    def _run(self, app):
+        while True:
+            self.wake.wait(self.refresh_seconds)
+            self.wake.clear()
+            try:
+                with app.app_context():
+                    try:
+                        self._refresh_now()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                log.exception("Suggest index refresh failed", extra={'event': 'suggest_error'})
+                time.sleep(1)
+            with self.lock:
+                if not (self.dirty or self.stale):
+                    self.idle.set()
+
+    def _refresh_now(self):
+        with self.lock:
+            stale, dirty = self.stale, self.dirty
+            self.stale, self.dirty = False, set()
+        if stale:
+            self.rebuild()
+            return
+        if time.monotonic() - self.checked_at >= self.refresh_seconds:
+            dirty |= self._changed_elsewhere()
+        if dirty:
+            self._apply(dirty)
+
+    def _changed_elsewhere(self):
+        """Ids cuya versión no coincide con la del índice (escrituras de otros procesos)"""
+        self.checked_at = time.monotonic()
+        current = dict(db.session.execute(
+            select(Product.id, Product.version).where(Product.is_active.is_(True))).all())
+        index = self.index
+        known = {pid: index.versions[rank] for pid, rank in index.positions.items()}
+        for product_id, change in self.overlay.items():
+            known.pop(product_id, None)
+            if change is not None:
+                known[product_id] = change[3]
+        return ({pid for pid, version in current.items() if known.get(pid) != version}
+                | (set(known) - set(current)))
+
+    def _apply(self, product_ids):
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.image_url,
+                   Product.category_id, Product.version)
+            .where(Product.id.in_(product_ids), Product.is_active.is_(True))).all()
+        overlay = {}
+        found = set()
+        for row in rows:
+            found.add(row[0])
+            weight = self._weight(row[0])
+            entry = (row[0], row[1], float(row[2]), row[3], row[4])
+            overlay[row[0]] = (entry, tuple(set(fold(row[1]).split())), weight, row[5])
+        for product_id in set(product_ids) - found:
+            overlay[product_id] = None
+        with self.lock:
+            # Los que han vuelto a cambiar mientras se leían siguen ocultos
+            # hasta la próxima vuelta
+            overlay = {**self.overlay, **overlay, **dict.fromkeys(self.dirty)}
+            if len(overlay) <= MAX_OVERLAY:
+                self.overlay = overlay
+                return
+        self.rebuild()
+
+    def _weight(self, product_id):
+        # La popularidad solo se recalcula al reconstruir; los nuevos empiezan en 0
+        rank = self.index.positions.get(product_id)
+        return self.index.weights[rank] if rank is not None else 0
+
+    def rebuild(self):
+        weights = dict(db.session.execute(
+            select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id)).all())
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.image_url,
+                   Product.category_id, Product.version)
+            .where(Product.is_active.is_(True))).all()
+        categories = db.session.execute(select(Category.id, Category.name)).all()
+        index = SuggestIndex(rows, categories, {pid: int(w) for pid, w in weights.items()})
+        with self.lock:
+            self.index = index
+            self.overlay = dict.fromkeys(self.dirty)
+        self.checked_at = time.monotonic()
+
+
+def get_suggester(app):
+    suggester = app.extensions.get('suggest')
+    if suggester is None:
+        suggester = app.extensions.setdefault(
+            'suggest', Suggester(app.config['SUGGEST_REFRESH_SECONDS']))
+    return suggester
+
+
+def products_changed(product_ids=None):
+    """Llamado por invalidate_products(): None = reconstruir todo"""
+    app = current_app._get_current_object()
+    suggester = app.extensions.get('suggest')
+    if suggester is not None:
+        suggester.changed(app, product_ids)
+
+
+def warm_suggest_index(app):
+    """Construye el índice ya (p.ej. en el maestro de gunicorn antes del fork)"""
+    try:
+        with app.app_context():
+            get_suggester(app).rebuild()
+            db.session.remove()
+    except Exception:
+        log.exception("Suggest index warm-up failed", extra={'event': 'suggest_error'})
+
+
+@suggest.route('/products/suggest', methods=['GET'])
+def suggest_products():
+    text = request.args.get('q', '')[:100]
+    limit = min(request.args.get('limit', 8, type=int), MAX_LIMIT)
+    app = current_app._get_current_object()
+    products, categories = get_suggester(app).query(app, text, max(limit, 1))
+    return jsonify({
+        'query': text,
+        'products': [{'id': pid, 'name': name, 'price': price, 'image_url': image_url,
+                      'category_id': category_id}
+                     for pid, name, price, image_url, category_id in products],
+        'categories': [{'id': category_id, 'name': name} for category_id, name in categories],
+    }), 200
@@ -2,6 +2,7 @@
 Validaciones adicionales para la aplicación
 """
 import re
+from datetime import datetime
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -85,7 +86,6 @@ def validate_expiry_date(expiry_date):
     month = int(month)
     year = int('20' + year)  # Asumir 20XX
 
-    from datetime import datetime
     current_date = datetime.now()
     current_year = current_date.year
     current_month = current_date.month
@@ -232,3 +232,335 @@ def rate_limit_by_ip(max_requests=100, window_seconds=3600):
             return f(*args, **kwargs)
         return decorated_function
     return decorator
+
+
+# ---------------------------------------------------------------------------
+# Esquemas declarativos compilados
+#
+# Cada esquema es un dict campo -> reglas. compile_schema() lo convierte una
+# sola vez (al importar el módulo) en una función validate(data, partial=False)
+# generada a medida, con las expresiones regulares ya compiladas, que devuelve
+# la misma lista de mensajes que validate_product_data/validate_user_data y
+# deja en `out` los valores ya convertidos.
+#
+# Reglas admitidas por campo:
+#   type            'str' | 'float' | 'int' | 'bool' | 'any' (float/int rechazan
+#                   bool, NaN e infinito; bool solo admite true/false)
+#   required        el campo no puede faltar ni estar vacío
+#   default         valor usado si falta (si no es requerido); en validación
+#                   parcial un null explícito es un error
+#   nullable        null es un valor válido y se conserva (columnas nullable)
+#   strip           quitar espacios antes de validar (str)
+#   remove          caracteres a eliminar antes del patrón (str)
+#   min_length / max_length, gt / ge, pattern, contains, check
+#   message         mensaje por defecto para cualquier fallo del campo
+#   required_message / type_message / pattern_message
+# ---------------------------------------------------------------------------
+
+
+def _luhn_valid(card_number):
+    total = 0
+    for i, digit in enumerate(reversed(card_number)):
+        digit = ord(digit) - 48
+        if i % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def _expiry_not_passed(expiry_date):
+    month, year = expiry_date.split('/')
+    month, year = int(month), 2000 + int(year)
+    today = datetime.now()
+    return year > today.year or (year == today.year and month >= today.month)
+
+
+def _field_steps(name, spec, const, partial):
+    """
+    Traduce las reglas de un campo a pasos para el generador de código:
+    ('stmt', código), ('when', condición), ('guard', condición_de_fallo, mensaje),
+    ('coerce', tipo, mensaje) y ('store', campo).
+    """
+    kind = spec.get('type', 'any')
+    default_message = spec.get('message', 'Valor inválido')
+    message = const(default_message)
+    required_message = const(spec.get('required_message', default_message))
+    type_message = const(spec.get('type_message', default_message))
+    pattern_message = const(spec.get('pattern_message', default_message))
+
+    steps = [('stmt', f"v = get({name!r})")]
+    if spec.get('required'):
+        # Igual que las funciones ad hoc: un valor falsy cuenta como ausente
+        steps.append(('guard', "not v", required_message))
+    elif spec.get('nullable'):
+        steps.append(('store_none', name))
+        steps.append(('when', "v is not None"))
+    elif spec.get('default') is not None:
+        if partial:
+            # El campo está presente: null no puede sustituirse por el valor por defecto
+            steps.append(('guard', "v is None", type_message))
+        else:
+            steps.append(('stmt', f"if v is None: v = {const(spec['default'])}"))
+    else:
+        steps.append(('when', "v is not None and v != ''"))
+
+    if kind == 'str':
+        steps.append(('guard', "v.__class__ is not str", type_message))
+        if spec.get('strip'):
+            steps.append(('stmt', "v = v.strip()"))
+            # Si min_length da el mismo mensaje, ya cubre la cadena vacía
+            if spec.get('required') and not (spec.get('min_length') and 'required_message' not in spec):
+                steps.append(('guard', "not v", required_message))
+    elif kind == 'float':
+        steps.append(('guard', "v.__class__ is bool", type_message))
+        steps.append(('coerce', 'float', type_message))
+        # NaN e infinito: v - v es NaN, que es verdadero
+        steps.append(('guard', "v - v", type_message))
+    elif kind == 'int':
+        steps.append(('guard', "v.__class__ is bool or v.__class__ is float and not v.is_integer()",
+                      type_message))
+        steps.append(('coerce', 'int', type_message))
+    elif kind == 'bool':
+        steps.append(('guard', "v.__class__ is not bool", type_message))
+
+    if 'min_length' in spec:
+        steps.append(('guard', f"len(v) < {spec['min_length']!r}", message))
+    if 'max_length' in spec:
+        steps.append(('guard', f"len(v) > {spec['max_length']!r}", message))
+    if 'gt' in spec:
+        steps.append(('guard', f"v <= {spec['gt']!r}", message))
+    if 'ge' in spec:
+        steps.append(('guard', f"v < {spec['ge']!r}", message))
+    if 'remove' in spec:
+        steps.append(('stmt', f"v = v.translate({const(str.maketrans('', '', spec['remove']))})"))
+    if 'pattern' in spec:
+        steps.append(('guard', f"{const(re.compile(spec['pattern']).match)}(v) is None", pattern_message))
+    for contains_pattern, contains_message in spec.get('contains', ()):
+        steps.append(('guard', f"{const(re.compile(contains_pattern).search)}(v) is None",
+                      const(contains_message)))
+    if 'check' in spec:
+        check, check_message = spec['check']
+        steps.append(('guard', f"not {const(check)}(v)", const(check_message)))
+    steps.append(('store', name))
+    return steps
+
+
+def _emit(steps, on_error, on_store, indent):
+    """Genera las líneas de los pasos; cada fallo corta el resto del campo"""
+    pad = '    ' * indent
+    lines = []
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        i += 1
+        if step[0] == 'stmt':
+            lines.append(pad + step[1])
+            continue
+        if step[0] == 'store':
+            lines.append(pad + on_store.format(repr(step[1])))
+            continue
+        if step[0] == 'store_none':
+            lines.append(f"{pad}if v is None and {step[1]!r} in data: {on_store.format(repr(step[1]))}")
+            continue
+
+        if step[0] == 'when':
+            lines.append(f"{pad}if {step[1]}:")
+        elif step[0] == 'guard':
+            # Guardas consecutivas como cadena if/elif
+            keyword = 'if'
+            while True:
+                lines.append(f"{pad}{keyword} {step[1]}:")
+                lines.append(f"{pad}    {on_error.format(step[2])}")
+                if i == len(steps) or steps[i][0] != 'guard':
+                    break
+                step, keyword = steps[i], 'elif'
+                i += 1
+            if i == len(steps):
+                return lines
+            lines.append(f"{pad}else:")
+        elif step[0] == 'coerce':
+            # Camino rápido si ya viene con el tipo correcto
+            lines.append(f"{pad}if v.__class__ is not {step[1]}:")
+            pad += '    '
+            lines.append(f"{pad}try:")
+            lines.append(f"{pad}    v = {step[1]}(v)")
+            lines.append(f"{pad}except (ValueError, TypeError, OverflowError):")
+            lines.append(f"{pad}    {on_error.format(step[2])}")
+            lines.append(f"{pad}    v = None")
+            pad = pad[4:]
+            if i == len(steps):
+                return lines
+            lines.append(f"{pad}if v is not None:")
+        lines.extend(_emit(steps[i:], on_error, on_store, indent + 1))
+        return lines
+    return lines
+
+
+def compile_schema(schema):
+    """
+    Compila un esquema declarativo generando el código de funciones
+    especializadas, sin bucles ni condiciones sobre reglas que no aplican:
+
+    validate(data, partial=False, out=None) -> lista de mensajes
+    validate.batch(rows, partial=False, out=None) -> (filas, campos, mensajes) con errores
+
+    Con `out` (un dict, o una lista en batch que recibe un dict por fila) se
+    devuelven también los valores convertidos y sin espacios de los campos
+    del esquema presentes y válidos.
+
+    Las variantes parciales (solo campos presentes) se generan aparte para que
+    la validación completa no pague la comprobación por campo.
+    """
+    namespace = {}
+
+    def const(value):
+        key = f"_c{len(namespace)}"
+        namespace[key] = value
+        return key
+
+    functions = []
+    for partial in (False, True):
+        fields = [(name, _field_steps(name, spec, const, partial)) for name, spec in schema.items()]
+        suffix = '_partial' if partial else ''
+        single = [f"def validate{suffix}(data, partial={partial}, out=None):"]
+        batch = [f"def validate_rows{suffix}(rows, partial={partial}, out=None):"]
+        if not partial:
+            single.append("    if partial: return validate_partial(data, out=out)")
+            batch.append("    if partial: return validate_rows_partial(rows, out=out)")
+        single += ["    errors = []",
+                   "    append = errors.append",
+                   "    get = data.get",
+                   "    if out is None: out = {}"]
+        batch += ["    error_rows, error_fields, error_messages = [], [], []",
+                  "    add_row, add_field, add_message = error_rows.append, error_fields.append, error_messages.append",
+                  "    for i, data in enumerate(rows):",
+                  "        get = data.get",
+                  "        clean = {}",
+                  "        if out is not None: out.append(clean)"]
+
+        for name, steps in fields:
+            if partial:
+                steps = [('when', f"{name!r} in data")] + steps
+            single.extend(_emit(steps, "append({})", "out[{}] = v", 1))
+            report = f"add_row(i); add_field({name!r}); add_message({{}})"
+            batch.extend(_emit(steps, report, "clean[{}] = v", 2))
+
+        single.append("    return errors")
+        batch.append("    return error_rows, error_fields, error_messages")
+        functions += single + [""] + batch + [""]
+
+    source = "\n".join(functions)
+    exec(compile(source, f"<schema {', '.join(schema)}>", 'exec'), namespace)
+
+    validate = namespace['validate']
+    validate.batch = namespace['validate_rows']
+    validate.source = source
+    return validate
+
+
+def validate_batch(validator, rows, partial=False, out=None):
+    """
+    Valida muchas filas en una llamada (importaciones masivas).
+
+    Recorre las filas en un único bucle generado y devuelve un informe columnar:
+    {"total": n, "invalid_rows": k,
+     "errors": {"row": [...], "field": [...], "message": [...]}}
+    Con `out` (lista) recibe un dict de valores convertidos por fila.
+    """
+    error_rows, error_fields, error_messages = validator.batch(rows, partial, out)
+    return {
+        "total": len(rows),
+        "invalid_rows": len(set(error_rows)),
+        "errors": {"row": error_rows, "field": error_fields, "message": error_messages},
+    }
+
+
+PRODUCT_SCHEMA = {
+    'name': {'type': 'str', 'required': True, 'strip': True, 'min_length': 2, 'max_length': 100,
+             'message': "El nombre del producto debe tener al menos 2 caracteres"},
+    'description': {'type': 'str', 'required': True, 'strip': True, 'min_length': 10,
+                    'message': "La descripción debe tener al menos 10 caracteres"},
+    'price': {'type': 'float', 'default': 0, 'gt': 0,
+              'message': "El precio debe ser mayor a 0",
+              'type_message': "El precio debe ser un número válido"},
+    'stock': {'type': 'int', 'default': 0, 'ge': 0,
+              'message': "El stock no puede ser negativo",
+              'type_message': "El stock debe ser un número entero válido"},
+    'category_id': {'type': 'int', 'required': True, 'gt': 0,
+                    'message': "La categoría es requerida"},
+    'is_active': {'type': 'bool', 'message': "is_active debe ser true o false"},
+    'image_url': {'type': 'str', 'nullable': True, 'strip': True, 'max_length': 255,
+                  'message': "La URL de la imagen no es válida"},
+    # Versión esperada (control optimista); la cabecera If-Match tiene prioridad
+    'version': {'type': 'int', 'gt': 0, 'message': "La versión no es válida"},
+}
+
+USER_SCHEMA = {
+    'email': {'type': 'str', 'required': True, 'strip': True,
+              'pattern': r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',
+              'required_message': "El email es requerido",
+              'message': "Formato de email inválido"},
+    'first_name': {'type': 'str', 'required': True, 'strip': True, 'min_length': 2,
+                   'message': "El nombre debe tener al menos 2 caracteres"},
+    'last_name': {'type': 'str', 'required': True, 'strip': True, 'min_length': 2,
+                  'message': "El apellido debe tener al menos 2 caracteres"},
+    'phone': {'type': 'str', 'remove': ' -()',
+              'pattern': r'^[\+]?[1-9][\d]{0,15}$|^[\+]?[(]?[\d\s\-\(\)]{10,}$',
+              'message': "Formato de teléfono inválido"},
+    'password': {'type': 'str', 'min_length': 6,
+                 'message': "La contraseña debe tener al menos 6 caracteres",
+                 'contains': [(r'[A-Za-z]', "La contraseña debe contener al menos una letra"),
+                              (r'[0-9]', "La contraseña debe contener al menos un número")]},
+}
+
+# POST /api/register: solo email y contraseña, el resto del perfil se completa después
+REGISTER_SCHEMA = {
+    'email': {**USER_SCHEMA['email'], 'max_length': 120},
+    'password': {**USER_SCHEMA['password'], 'required': True,
+                 'required_message': "La contraseña es requerida"},
+}
+
+CHECKOUT_SCHEMA = {
+    'shipping_address': {'type': 'str', 'required': True, 'strip': True, 'min_length': 5,
+                         'message': "La dirección de envío es requerida"},
+    'cardholder_name': {'type': 'str', 'required': True, 'strip': True, 'min_length': 2,
+                        'message': "El nombre del titular es requerido"},
+    'card_number': {'type': 'str', 'required': True, 'remove': ' -', 'pattern': r'^\d{13,19}$',
+                    'check': (_luhn_valid, "Número de tarjeta inválido"),
+                    'message': "Número de tarjeta inválido"},
+    'expiry_date': {'type': 'str', 'required': True, 'pattern': r'^(0[1-9]|1[0-2])\/([0-9]{2})$',
+                    'check': (_expiry_not_passed, "La tarjeta está expirada"),
+                    'message': "Fecha de expiración inválida (MM/YY)"},
+    'cvv': {'type': 'str', 'required': True, 'pattern': r'^\d{3,4}$',
+            'message': "CVV inválido"},
+}
+
+validate_product = compile_schema(PRODUCT_SCHEMA)
+validate_user = compile_schema(USER_SCHEMA)
+validate_register = compile_schema(REGISTER_SCHEMA)
+validate_checkout = compile_schema(CHECKOUT_SCHEMA)
+
+
+def validate_json(validator, partial=False):
+    """
+    Decorador: valida el cuerpo JSON con un validador compilado antes de
+    llamar a la ruta. Con partial=True solo se validan los campos presentes.
+    La ruta recibe en `data` solo los campos del esquema, ya convertidos.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict):
+                return jsonify({"error": "Se requiere un cuerpo JSON"}), 400
+
+            data = {}
+            errors = validator(body, partial=partial, out=data)
+            if errors:
+                return jsonify({"error": errors[0], "errors": errors}), 400
+
+            return f(*args, data=data, **kwargs)
+        return decorated_function
+    return decorator
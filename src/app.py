@@ -4,18 +4,13 @@ This module takes care of starting the API Server, Loading the DB and Adding the
 import os
 import sys
 from datetime import timedelta
-from flask import Flask, request, jsonify, url_for, send_from_directory, Blueprint, jsonify
-from flask_migrate import Migrate
-from flask_swagger import swagger
-from flask_jwt_extended import JWTManager
+from flask import Flask, jsonify, send_from_directory, Blueprint
 from flask_cors import CORS
 from api.utils import APIException, generate_sitemap
 from api.models import db
-from api.routes import api
-from api.admin import setup_admin
-from api.commands import setup_commands
-from dotenv import load_dotenv
-from sqlalchemy import text
+from api.health import health, configure_pool, database_check
+from api.logs import setup_logging, parse_sample_rates
+from api.profiling import setup_profiling
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
@@ -23,109 +18,209 @@ ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../dist/')
 
-# Cargar variables de entorno
-load_dotenv()
-
-app = Flask(__name__)
-app.config['APPLICATION_NAME'] = 'API CROCHET'
-app.url_map.strict_slashes = False
-
-CORS(app, resources={
-    r"/api/*": {
-        "origins": [
-            "http://localhost:3000",
-            "http://127.0.0.1:3000",
-            "http://localhost:5173",
-            "http://127.0.0.1:5173",
-            "https://*.gitpod.io",
-            "https://*.codespaces.githubusercontent.com",
-            "https://special-parakeet-jjv5xj9v6p5f5jw9-3001.app.github.dev"
-        ],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+_dotenv_loaded = False
+
+
+def _load_env():
+    """Cargar variables de entorno (.env) una sola vez por proceso"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default) == '1'
+
+
+def default_config():
+    """Configuración leída del entorno; create_app() la combina con la recibida"""
+    return {
+        'APPLICATION_NAME': 'API CROCHET',
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this-in-production'),
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(days=7),
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL'),
+        # Réplica de lectura opcional para las rutas GET del catálogo
+        'DATABASE_READ_URL': os.getenv('DATABASE_READ_URL'),
+        'REPLICA_STICKY_SECONDS': int(os.getenv('REPLICA_STICKY_SECONDS', 5)),
+        'REPLICA_RETRY_SECONDS': int(os.getenv('REPLICA_RETRY_SECONDS', 30)),
+        # Segundos entre comprobaciones de base de datos de /readyz
+        'HEALTH_CHECK_INTERVAL': int(os.getenv('HEALTH_CHECK_INTERVAL', 10)),
+        # Caché en memoria de GET /api/products/<id> (por proceso)
+        'PRODUCT_CACHE_SIZE': int(os.getenv('PRODUCT_CACHE_SIZE', 1024)),
+        'PRODUCT_CACHE_TTL': int(os.getenv('PRODUCT_CACHE_TTL', 30)),
+        # /api/orders/stream (SSE)
+        'ORDER_EVENTS_POLL_INTERVAL': float(os.getenv('ORDER_EVENTS_POLL_INTERVAL', 1)),
+        'ORDER_STREAM_HEARTBEAT': int(os.getenv('ORDER_STREAM_HEARTBEAT', 15)),
+        'ORDER_STREAM_MAX_SECONDS': int(os.getenv('ORDER_STREAM_MAX_SECONDS', 300)),
+        'ORDER_STREAM_QUEUE_SIZE': int(os.getenv('ORDER_STREAM_QUEUE_SIZE', 100)),
+        # Streams abiertos por worker: con gthread, por debajo de GUNICORN_THREADS
+        'ORDER_STREAM_MAX_CONNECTIONS': int(os.getenv('ORDER_STREAM_MAX_CONNECTIONS', 8)),
+        # Logs JSON (api.logs): tamaño de la cola, muestreo y límite por tipo de mensaje
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
+        'LOG_QUEUE_SIZE': int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+        'LOG_RATE_LIMIT': int(os.getenv('LOG_RATE_LIMIT', 20)),
+        'LOG_SAMPLE_RATES': parse_sample_rates(os.getenv(
+            'LOG_SAMPLE_RATES', 'jwt_invalid=0.1,jwt_unauthorized=0.1')),
+        # Perfilado de peticiones (api.profiling); vacío = desactivado
+        'PROFILE_TOKEN': os.getenv('PROFILE_TOKEN'),
+        'PROFILE_SAMPLE_RATES': parse_sample_rates(os.getenv('PROFILE_SAMPLE_RATES')),
+        'PROFILE_INTERVAL_MS': float(os.getenv('PROFILE_INTERVAL_MS', 1)),
+        # Índice de /api/products/suggest
+        'SUGGEST_REFRESH_SECONDS': int(os.getenv('SUGGEST_REFRESH_SECONDS', 60)),
+        'SUGGEST_PRELOAD': _env_flag('SUGGEST_PRELOAD', '1'),
+        'SECRET_KEY': os.getenv('FLASK_APP_KEY'),
+        'DEBUG': os.getenv('FLASK_DEBUG') == '1',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Subsistemas opcionales
+        'ENABLE_ADMIN': _env_flag('ENABLE_ADMIN', '1'),
+        'ENABLE_CLI': _env_flag('ENABLE_CLI', '1'),
+        'ENABLE_SWAGGER': _env_flag('ENABLE_SWAGGER', '0'),
+        'ENABLE_TEST_DB': _env_flag('ENABLE_TEST_DB', '1'),
+        # Límites de /api/batch
+        'BATCH_MAX_REQUESTS': int(os.getenv('BATCH_MAX_REQUESTS', 20)),
+        'BATCH_MAX_WORKERS': int(os.getenv('BATCH_MAX_WORKERS', 4)),
+        'BATCH_MAX_BYTES': int(os.getenv('BATCH_MAX_BYTES', 1024 * 1024)),
     }
-}, supports_credentials=True)
 
-app.config['JWT_SECRET_KEY'] = os.getenv(
-    'JWT_SECRET_KEY', 'your-secret-key-change-this-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
-jwt = JWTManager(app)
 
-
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    print("JWT token expired")
-    return jsonify({"error": "Token has expired"}), 401
-
-
-@jwt.invalid_token_loader
-def invalid_token_callback(error):
-    print(f"Invalid JWT token: {error}")
-    return jsonify({"error": "Invalid token"}), 422
-
-
-@jwt.unauthorized_loader
-def unauthorized_callback(error):
-    print(f"Unauthorized JWT: {error}")
-    return jsonify({"error": "Authentication required"}), 401
-
-
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-app.config['SECRET_KEY'] = os.getenv('FLASK_APP_KEY')
-app.config['DEBUG'] = os.getenv('FLASK_DEBUG') == '1'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
-db.init_app(app)
-
-setup_admin(app)
-setup_commands(app)
-# Registrar solo una vez los blueprints y evitar rutas duplicadas
-app.register_blueprint(api, url_prefix='/api')
-
-
-bp_test_db = Blueprint('test_db', __name__)
-
-
-@bp_test_db.route('/test-db', methods=['GET'])
-def test_db():
-    try:
-        db.session.execute(text('SELECT 1'))
-        return jsonify({'status': 'ok', 'message': 'Conexión exitosa a la base de datos'})
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
-
-
-app.register_blueprint(bp_test_db, url_prefix='/api')
-
-
-@app.errorhandler(APIException)
-def handle_invalid_usage(error):
-    return jsonify(error.to_dict()), error.status_code
-
-
-@app.route('/')
-def sitemap():
-    if ENV == "development":
-        return generate_sitemap(app)
-    index_path = os.path.join(static_file_dir, 'index.html')
-    if os.path.isfile(index_path):
-        with open(index_path, 'r', encoding='utf-8') as f:
-            html = f.read()
-        html = html.replace('<title>', '<title>API CROCHET - ')
-        return html
-    return send_from_directory(static_file_dir, 'index.html')
-
-
-@app.route('/<path:path>', methods=['GET'])
-def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0
-    return response
+def create_app(config=None):
+    """
+    Construye una aplicación independiente. `config` (dict) sobrescribe los
+    valores del entorno, p.ej. create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'ENABLE_ADMIN': False}) para tests y benchmarks.
+    """
+    _load_env()
+
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+    app.url_map.strict_slashes = False
+
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": [
+                "http://localhost:3000",
+                "http://127.0.0.1:3000",
+                "http://localhost:5173",
+                "http://127.0.0.1:5173",
+                "https://*.gitpod.io",
+                "https://*.codespaces.githubusercontent.com",
+                "https://special-parakeet-jjv5xj9v6p5f5jw9-3001.app.github.dev"
+            ],
+            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "If-Match"],
+            "expose_headers": ["ETag"]
+        }
+    }, supports_credentials=True)
+
+    log = setup_logging(app)
+    setup_profiling(app)
+    setup_jwt(app, log)
+    configure_pool(app)
+    db.init_app(app)
+
+    if app.config['DATABASE_READ_URL']:
+        from api.replica import setup_replica
+        setup_replica(app)
+
+    if app.config['ENABLE_CLI']:
+        # Flask-Migrate importa alembic: solo hace falta para `flask db ...`
+        from flask_migrate import Migrate
+        from api.commands import setup_commands
+        Migrate(app, db, compare_type=True)
+        setup_commands(app)
+
+    if app.config['ENABLE_ADMIN']:
+        from api.admin import setup_admin
+        setup_admin(app)
+
+    # Registrar solo una vez los blueprints y evitar rutas duplicadas
+    from api.routes import api
+    from api.batch import batch
+    from api.order_events import order_events
+    from api.suggest import suggest
+    app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(suggest, url_prefix='/api')
+    app.register_blueprint(batch, url_prefix='/api')
+    app.register_blueprint(order_events, url_prefix='/api')
+    app.register_blueprint(health)
+
+    if app.config['ENABLE_TEST_DB']:
+        app.register_blueprint(build_test_db_blueprint(), url_prefix='/api')
+
+    if app.config['ENABLE_SWAGGER']:
+        @app.route('/api/spec')
+        def spec():
+            from flask_swagger import swagger
+            return jsonify(swagger(app))
+
+    @app.errorhandler(APIException)
+    def handle_invalid_usage(error):
+        return jsonify(error.to_dict()), error.status_code
+
+    @app.route('/')
+    def sitemap():
+        if ENV == "development":
+            return generate_sitemap(app)
+        index_path = os.path.join(static_file_dir, 'index.html')
+        if os.path.isfile(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+            html = html.replace('<title>', '<title>API CROCHET - ')
+            return html
+        return send_from_directory(static_file_dir, 'index.html')
+
+    @app.route('/<path:path>', methods=['GET'])
+    def serve_any_other_file(path):
+        if not os.path.isfile(os.path.join(static_file_dir, path)):
+            path = 'index.html'
+        response = send_from_directory(static_file_dir, path)
+        response.cache_control.max_age = 0
+        return response
+
+    return app
+
+
+def setup_jwt(app, log):
+    from api.batch import BatchJWTManager
+    jwt = BatchJWTManager(app)
+
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        log.info("JWT token expired", extra={'event': 'jwt_expired', 'user_id': jwt_payload.get('sub')})
+        return jsonify({"error": "Token has expired"}), 401
+
+    @jwt.invalid_token_loader
+    def invalid_token_callback(error):
+        log.warning("Invalid JWT token: %s", error, extra={'event': 'jwt_invalid'})
+        return jsonify({"error": "Invalid token"}), 422
+
+    @jwt.unauthorized_loader
+    def unauthorized_callback(error):
+        log.info("Unauthorized JWT: %s", error, extra={'event': 'jwt_unauthorized'})
+        return jsonify({"error": "Authentication required"}), 401
+
+    return jwt
+
+
+def build_test_db_blueprint():
+    bp_test_db = Blueprint('test_db', __name__)
+
+    @bp_test_db.route('/test-db', methods=['GET'])
+    def test_db():
+        # Usa la comprobación cacheada de /readyz en lugar de un SELECT 1 por llamada
+        if database_check()['ok']:
+            return jsonify({'status': 'ok', 'message': 'Conexión exitosa a la base de datos'})
+        return jsonify({'status': 'error', 'message': 'No se pudo conectar a la base de datos'}), 500
+
+    return bp_test_db
 
 
 if __name__ == '__main__':
+    app = create_app()
     PORT = int(os.environ.get('PORT', 3001))
     print(f"🚀 Starting Flask server on port {PORT}...")
     print("🔗 CORS configured for frontend on port 3000")
@@ -0,0 +1,125 @@
+"""
+Benchmark de la vista de listado de usuarios en Flask-Admin.
+
+Compara el ModelView por defecto (COUNT(*) exacto, ordenación libre) con
+UserView (conteo acotado, ordenación por columnas indexadas) sobre una base
+SQLite temporal con N usuarios. También recorre el listado del resto de
+vistas (productos, pedidos, carritos...) con --rows filas en cada tabla, de
+modo que un error en cualquiera de ellas hace fallar el benchmark.
+
+    $ python src/benchmarks/admin_list.py --users 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from flask_admin.contrib.sqla import ModelView  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import create_app  # noqa: E402
+from api.models import db, User, Category, Product, CartItem, Order, OrderItem  # noqa: E402
+
+
+def build_app(database_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'ENABLE_ADMIN': True,
+        'ENABLE_CLI': False,
+        'ENABLE_TEST_DB': False,
+        'LOG_LEVEL': 'WARNING',
+    })
+    # Vista sin ajustar, tal como estaba antes, para comparar
+    app.extensions['admin'][0].add_view(
+        ModelView(User, db.session, name='Baseline', endpoint='baseline_user'))
+    return app
+
+
+def seed_users(count, chunk_size=50000):
+    password = generate_password_hash('123456')
+    for start in range(0, count, chunk_size):
+        rows = [
+            {
+                'email': f'bench_user{x}@test.com',
+                'password': password,
+                'first_name': f'Usuario{x}',
+                'last_name': 'Prueba',
+                'is_active': True,
+            }
+            for x in range(start, min(start + chunk_size, count))
+        ]
+        db.session.execute(User.__table__.insert(), rows)
+        db.session.commit()
+
+
+def seed_related(count, users):
+    """`count` productos, pedidos, líneas y carritos repartidos entre los usuarios"""
+    db.session.execute(Category.__table__.insert(), [{'name': 'Bench', 'description': 'Benchmark'}])
+    db.session.execute(Product.__table__.insert(), [
+        {'name': f'Producto {x}', 'price': 10, 'stock': 5, 'category_id': 1, 'is_active': True}
+        for x in range(1, count + 1)])
+    db.session.execute(Order.__table__.insert(), [
+        {'user_id': x % users + 1, 'total_amount': 10, 'status': 'pending'}
+        for x in range(count)])
+    db.session.execute(OrderItem.__table__.insert(), [
+        {'order_id': x, 'product_id': x, 'quantity': 1, 'price': 10}
+        for x in range(1, count + 1)])
+    db.session.execute(CartItem.__table__.insert(), [
+        {'user_id': x % users + 1, 'product_id': x, 'quantity': 1}
+        for x in range(1, count + 1)])
+    db.session.commit()
+
+
+def measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--rows', type=int, default=10000,
+                        help="Filas de productos, pedidos, líneas y carritos")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed_users(args.users)
+            seed_related(args.rows, args.users)
+            print(f"Seeded {args.users} users and {args.rows} rows per table "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        cases = [
+            ('baseline first page', '/admin/baseline_user/'),
+            ('baseline sort by last_name', '/admin/baseline_user/?sort=3'),
+            ('tuned first page', '/admin/user/'),
+            ('tuned sort by email', '/admin/user/?sort=1'),
+            ('tuned page 100', '/admin/user/?page=100'),
+            ('tuned filtered by email', '/admin/user/?flt1_7=bench_user1@test.com'),
+            ('categories', '/admin/category/'),
+            ('products', '/admin/product/'),
+            ('cart items', '/admin/cartitem/'),
+            ('orders', '/admin/order/'),
+            ('order items', '/admin/orderitem/'),
+        ]
+        client = app.test_client()
+        print(f"{'case':<32}{'median ms':>12}{'max ms':>12}")
+        for label, url in cases:
+            median, worst = measure(client, url, args.repeat)
+            print(f"{label:<32}{median:>12.1f}{worst:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
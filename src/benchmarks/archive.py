@@ -0,0 +1,156 @@
+"""
+Latencia de las consultas sobre la tabla order antes y después de `flask archive-orders`.
+
+Genera el dataset de `flask seed` en una base SQLite temporal, mide el
+historial de pedidos (GET /api/orders) y dos consultas de administración
+sobre la tabla caliente, archiva los pedidos completados anteriores a
+--cutoff y repite las medidas. Al final mide las lecturas que van al archivo.
+
+    $ python src/benchmarks/archive.py --scale 5
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import select, func  # noqa: E402
+from app import create_app  # noqa: E402
+from api.models import db, Order, OrderItem, ArchivedOrder  # noqa: E402
+from api.seed import run_seed  # noqa: E402
+from api.archive import archive_orders  # noqa: E402
+
+
+def build_app(database_path):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        'ENABLE_TEST_DB': False,
+        'LOG_LEVEL': 'WARNING',
+    })
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+def request_timer(client, url, tokens):
+    """Cada llamada hace la petición como el siguiente usuario de `tokens`"""
+    cycle = itertools.cycle(tokens)
+
+    def run():
+        response = client.get(url, headers={'Authorization': f'Bearer {next(cycle)}'})
+        assert response.status_code == 200, (url, response.status_code)
+    return run
+
+
+def query_timer(statement):
+    def run():
+        db.session.execute(statement).all()
+        db.session.remove()
+    return run
+
+
+def hot_cases(app, tokens):
+    return [
+        ('GET /api/orders?limit=20', request_timer(app.test_client(), '/api/orders?limit=20', tokens)),
+        ('open orders by status', query_timer(
+            select(Order.status, func.count()).where(Order.status.in_(('pending', 'paid', 'shipped')))
+            .group_by(Order.status))),
+        ('revenue since 2025-12-01', query_timer(
+            select(func.sum(OrderItem.price * OrderItem.quantity))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.created_at >= datetime(2025, 12, 1)))),
+    ]
+
+
+def archive_cases(app):
+    with app.app_context():
+        archived = db.session.execute(
+            select(ArchivedOrder.id, ArchivedOrder.user_id).order_by(ArchivedOrder.id).limit(200)).all()
+        tokens = [create_access_token(identity=str(user_id)) for _, user_id in archived]
+    client = app.test_client()
+    by_id = itertools.cycle(archived)
+    tokens_by_order = dict(zip((order_id for order_id, _ in archived), tokens))
+
+    def get_archived_order():
+        order_id, _ = next(by_id)
+        response = client.get(f'/api/orders/{order_id}',
+                              headers={'Authorization': f'Bearer {tokens_by_order[order_id]}'})
+        assert response.status_code == 200, (order_id, response.status_code)
+
+    return [
+        ('GET /api/orders?include_archived=1',
+         request_timer(client, '/api/orders?limit=20&include_archived=1', tokens)),
+        ('GET /api/orders/<archived id>', get_archived_order),
+    ]
+
+
+def analyze():
+    # Estadísticas del planificador al día, como tras el autovacuum en producción
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    db.session.remove()
+
+
+def report(app, label, cases, repeat):
+    print(label)
+    with app.app_context():
+        for name, function in cases:
+            median, p99 = timed(function, repeat)
+            print(f"  {name:<36}{median:>10.2f}{p99:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--cutoff', default='2025-07-01',
+                        help="Se archivan los pedidos completados anteriores a esta fecha")
+    parser.add_argument('--users', type=int, default=200, help="Usuarios distintos consultados")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            run_seed(args.scale, seed=args.seed, echo=lambda message: None)
+            print(f"Seeded scale {args.scale} in {time.perf_counter() - started:.1f}s")
+            user_ids = db.session.scalars(select(Order.user_id).distinct()).all()
+            users = random.Random(args.seed).sample(user_ids, min(args.users, len(user_ids)))
+            tokens = [create_access_token(identity=str(user_id)) for user_id in users]
+            analyze()
+
+        print(f"{'':<38}{'median ms':>10}{'p99 ms':>10}")
+        report(app, 'before archiving', hot_cases(app, tokens), args.repeat)
+
+        with app.app_context():
+            started = time.perf_counter()
+            orders, items = archive_orders(datetime.fromisoformat(args.cutoff), echo=lambda message: None)
+            hot = db.session.scalar(select(func.count(Order.id)))
+            print(f"Archived {orders} orders, {items} items in {time.perf_counter() - started:.1f}s "
+                  f"({hot} orders left in the hot table)")
+            analyze()
+
+        report(app, 'after archiving', hot_cases(app, tokens), args.repeat)
+        report(app, 'archive on demand', archive_cases(app), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Informe de arranque: tiempo de import/create_app y memoria por worker.
+
+1. En un proceso nuevo por caso, mide importar app.py + create_app() con
+   distintos subsistemas activados y la RSS máxima resultante.
+2. Arranca gunicorn con y sin --preload y lee PSS/Private de cada worker en
+   /proc/<pid>/smaps_rollup (solo Linux).
+
+    $ python src/benchmarks/startup.py --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(json.loads(sys.argv[1]))
+built = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_ms': (built - imported) * 1000,
+    'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+}))
+"""
+
+CASES = [
+    ('all subsystems', {'ENABLE_ADMIN': True, 'ENABLE_CLI': True,
+                        'ENABLE_TEST_DB': True, 'ENABLE_SWAGGER': True}),
+    ('default web (wsgi.py)', {'ENABLE_CLI': False}),
+    ('api only', {'ENABLE_ADMIN': False, 'ENABLE_CLI': False,
+                  'ENABLE_TEST_DB': False, 'ENABLE_SWAGGER': False}),
+]
+
+
+def probe_startup(env, repeat):
+    print(f"{'case':<26}{'import ms':>11}{'create ms':>11}{'maxrss MB':>11}{'modules':>9}")
+    for label, config in CASES:
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.check_output(
+                [sys.executable, '-c', PROBE, json.dumps(config)], cwd=SRC_DIR, env=env)
+            runs.append(json.loads(out))
+        best = min(runs, key=lambda r: r['import_ms'] + r['create_ms'])
+        print(f"{label:<26}{best['import_ms']:>11.1f}{best['create_ms']:>11.1f}"
+              f"{best['maxrss_mb']:>11.1f}{best['modules']:>9}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def smaps(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Pss:', 'Private_Clean:', 'Private_Dirty:', 'Rss:'):
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return values
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def probe_gunicorn(env, workers, preload):
+    port = free_port()
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as conf:
+        # Config propia para no heredar preload_app de gunicorn.conf.py
+        conf.write(f'preload_app = {preload}\n')
+    cmd = [sys.executable, '-m', 'gunicorn', 'wsgi', '--chdir', SRC_DIR,
+           '-c', conf.name, '-w', str(workers), '-b', f'127.0.0.1:{port}']
+    master = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/test', timeout=1)
+                if len(worker_pids(master.pid)) == workers:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        # Una petición por worker (aprox.) para que carguen lo perezoso
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/test', timeout=1)
+        pids = worker_pids(master.pid)
+        stats = [smaps(pid) for pid in pids]
+        return smaps(master.pid), stats
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+        os.unlink(conf.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        probe_startup(env, args.repeat)
+
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            print("smaps_rollup no disponible: se omite la medición de workers")
+            return
+
+        print()
+        print(f"{'gunicorn':<14}{'master PSS':>12}{'worker PSS':>12}{'worker priv':>13}{'total PSS':>11}")
+        for preload in (False, True):
+            master, stats = probe_gunicorn(env, args.workers, preload)
+            pss = sum(s['Pss'] for s in stats) / len(stats)
+            private = sum(s['Private_Clean'] + s['Private_Dirty'] for s in stats) / len(stats)
+            total = master['Pss'] + sum(s['Pss'] for s in stats)
+            label = '--preload' if preload else 'no preload'
+            print(f"{label:<14}{master['Pss']:>12.1f}{pss:>12.1f}{private:>13.1f}{total:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Índice de /api/products/suggest: memoria, tiempo de construcción y latencia.
+
+    $ python src/benchmarks/suggest.py --products 100000
+
+Usa los nombres de `flask seed` (sin base de datos) y popularidad Zipf.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from api.seed import generate_products, _blocks, CATEGORIES, ZIPF_EXPONENT  # noqa: E402
+from api.suggest import SuggestIndex, Suggester, fold  # noqa: E402
+
+
+def make_rows(count, seed):
+    category_ids = list(range(1, len(CATEGORIES) + 1))
+    rows = []
+    for block in map(generate_products, _blocks(seed, 1, count, category_ids)):
+        rows.extend((p['id'], p['name'], p['price'], p['image_url'], p['category_id'], 1) for p in block)
+    ranking = list(range(1, count + 1))
+    random.Random(seed).shuffle(ranking)
+    weights = {pid: int(10000 / rank ** ZIPF_EXPONENT) for rank, pid in enumerate(ranking, 1)}
+    return rows, weights
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows, weights = make_rows(args.products, args.seed)
+    categories = [(i, name) for i, (name, _) in enumerate(CATEGORIES, 1)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = SuggestIndex(rows, categories, weights)
+    build = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"products: {len(index)}  vocabulary: {len(index.vocabulary)}")
+    print(f"build: {build * 1000:.0f} ms")
+    print(f"memory: {size / 2**20:.1f} MiB ({size / 2**20 * 100000 / len(index):.1f} MiB per 100k products)")
+
+    suggester = Suggester(refresh_seconds=10 ** 9)
+    suggester.index, suggester.checked_at = index, time.monotonic()
+
+    rng = random.Random(args.seed)
+    words = [fold(name).split() for _, name, *_ in rows[:1000]]
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(words)
+        first = rng.choice(name)
+        query = first[:rng.randint(1, len(first))]
+        if rng.random() < 0.3:
+            second = rng.choice(name)
+            query = f'{first} {second[:rng.randint(1, len(second))]}'
+        queries.append(query)
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        suggester.query(None, query, 8)
+        timings.append((time.perf_counter() - started) * 1e6)
+    print(f"query: p50 {percentile(timings, 0.5):.0f} us  p99 {percentile(timings, 0.99):.0f} us  "
+          f"max {max(timings):.0f} us")
+
+
+if __name__ == '__main__':
+    main()
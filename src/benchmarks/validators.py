@@ -0,0 +1,96 @@
+"""
+Microbenchmark: validadores compilados frente a las funciones ad hoc.
+
+    $ python src/benchmarks/validators.py --rows 10000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from api.validators import (  # noqa: E402
+    validate_product_data, validate_user_data, validate_card_number,
+    validate_expiry_date, validate_cvv, validate_product, validate_user,
+    validate_checkout, validate_batch,
+)
+
+
+def make_products(count, rng):
+    rows = []
+    for i in range(count):
+        rows.append({
+            'name': rng.choice(['Osito de Peluche', 'B', '  Gorro de Invierno ']),
+            'description': rng.choice(['Tejido a mano con hilo suave', 'corta']),
+            'price': rng.choice([25.99, '18.50', 0, 'abc']),
+            'stock': rng.choice([10, '3', -1]),
+            'category_id': rng.choice([1, 2, None]),
+        })
+    return rows
+
+
+def make_users(count, rng):
+    return [{
+        'email': rng.choice([f'user{i}@test.com', 'no-es-email']),
+        'first_name': rng.choice(['Ana', 'B']),
+        'last_name': 'Prueba',
+        'phone': rng.choice(['(555) 123-4567', '+34 600 000 000', 'abc']),
+        'password': rng.choice(['abc123', 'abcdef', '123']),
+    } for i in range(count)]
+
+
+def make_checkouts(count, rng):
+    return [{
+        'shipping_address': '123 Calle Principal',
+        'cardholder_name': 'Ana Prueba',
+        'card_number': rng.choice(['4111 1111 1111 1111', '4111-1111-1111-1112']),
+        'expiry_date': rng.choice(['12/39', '01/20', '13/30']),
+        'cvv': rng.choice(['123', '12a']),
+    } for _ in range(count)]
+
+
+def legacy_checkout(data):
+    errors = []
+    if not validate_card_number(data.get('card_number')):
+        errors.append("Número de tarjeta inválido")
+    if not validate_expiry_date(data.get('expiry_date')):
+        errors.append("Fecha de expiración inválida")
+    if not validate_cvv(data.get('cvv')):
+        errors.append("CVV inválido")
+    return errors
+
+
+def bench(label, fn, rows, repeat):
+    best = min(timeit.repeat(lambda: fn(rows), number=1, repeat=repeat))
+    print(f"{label:<34}{best * 1000:>10.2f} ms{best / len(rows) * 1e6:>10.2f} us/row")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    datasets = [
+        ('product', make_products(args.rows, rng), validate_product_data, validate_product),
+        ('user', make_users(args.rows, rng), validate_user_data, validate_user),
+        ('checkout', make_checkouts(args.rows, rng), legacy_checkout, validate_checkout),
+    ]
+
+    for name, rows, legacy, compiled in datasets:
+        if name != 'checkout':
+            mismatches = sum(legacy(row) != compiled(row) for row in rows)
+            print(f"[{name}] filas con mensajes distintos: {mismatches}")
+        old = bench(f'{name}: legacy per row', lambda rs: [legacy(r) for r in rs], rows, args.repeat)
+        new = bench(f'{name}: compiled per row', lambda rs: [compiled(r) for r in rs], rows, args.repeat)
+        batch = bench(f'{name}: compiled batch', lambda rs: validate_batch(compiled, rs), rows, args.repeat)
+        print(f"{'':<34}speedup x{old / new:.2f} (row), x{old / batch:.2f} (batch)")
+        print()
+
+
+if __name__ == '__main__':
+    main()
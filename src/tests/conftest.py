@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from app import create_app  # noqa: E402
+from api.models import db, Category, Product  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        'LOG_LEVEL': 'WARNING',
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(Category(name='Amigurumis', description='Muñecos tejidos'))
+        db.session.add(Product(name='Osito', description='Osito tejido a mano', price=20,
+                               stock=5, category_id=1, is_active=True))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,39 @@
+import pytest
+
+from app import create_app
+from api.models import db, User
+
+
+@pytest.fixture
+def admin_client():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'ENABLE_CLI': False,
+        'LOG_LEVEL': 'WARNING',
+        'ADMIN_PAGE_SIZE': 5,
+        'ADMIN_MAX_PAGE_SIZE': 10,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.execute(User.__table__.insert(), [
+            {'email': f'user{x}@test.com', 'password': 'x', 'is_active': True} for x in range(30)])
+        db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.parametrize('page_size, rows, pages', [
+    ('', 5, 6),
+    ('-1', 1, 30),
+    ('0', 5, 6),
+    ('100000', 10, 3),
+])
+def test_user_list_page_size_is_bounded(admin_client, page_size, rows, pages):
+    response = admin_client.get(f'/admin/user/?page_size={page_size}')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert html.count('name="rowid"') == rows
+    assert f'page={pages - 1}' in html
+    assert f'page={pages}' not in html
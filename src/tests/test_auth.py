@@ -0,0 +1,30 @@
+import pytest
+
+
+def test_register_returns_token(client):
+    response = client.post('/api/register', json={'email': ' ana@test.com ', 'password': 'lana123'})
+    assert response.status_code == 201
+    assert response.get_json()['user']['email'] == 'ana@test.com'
+    assert client.post('/api/login', json={'email': 'ana@test.com', 'password': 'lana123'}).status_code == 200
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'email': 'ana@test.com'},
+    {'password': 'lana123'},
+    {'email': 'no-es-un-email', 'password': 'lana123'},
+    {'email': 'ana@test.com', 'password': 'abc12'},
+    {'email': 'ana@test.com', 'password': 'sololetras'},
+    {'email': 'ana@test.com', 'password': 123456},
+    {'email': 'a' * 120 + '@test.com', 'password': 'lana123'},
+])
+def test_register_validates_body(client, body):
+    response = client.post('/api/register', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_register_rejects_existing_email(client):
+    body = {'email': 'ana@test.com', 'password': 'lana123'}
+    assert client.post('/api/register', json=body).status_code == 201
+    assert client.post('/api/register', json=body).status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.mark.parametrize('sub', [
+    {'method': 'POST', 'path': '/api/batch'},
+    {'method': 'POST', 'path': '/api/%62atch'},
+    {'method': 'GET', 'path': '/api/orders/stream'},
+    {'method': 'GET', 'path': '/api/orders/%73tream'},
+    {'method': 'GET', 'path': '/api/orders/stream?jwt=x'},
+])
+def test_batch_rejects_nested_batch_and_streams(client, sub):
+    response = client.post('/api/batch', json={'requests': [sub]})
+    assert response.status_code == 400
+
+
+def test_batch_unroutable_sub_request_keeps_its_status(client):
+    response = client.post('/api/batch', json={'requests': [{'method': 'DELETE', 'path': '/api/nope'}]})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'] == 405
+
+
+def test_parallel_batch_keeps_reads_after_writes(client):
+    response = client.post('/api/batch', json={'parallel': True, 'requests': [
+        {'method': 'GET', 'path': '/api/products/1'},
+        {'method': 'GET', 'path': '/api/products'},
+        {'method': 'PATCH', 'path': '/api/products/1', 'body': {'version': 1, 'stock': 2}},
+        {'method': 'GET', 'path': '/api/products/1'},
+        {'method': 'GET', 'path': '/api/products'},
+        {'method': 'PATCH', 'path': '/api/products/1', 'body': {'version': 2, 'stock': 3}},
+        {'method': 'GET', 'path': '/api/products/1'},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [200] * 7
+    assert [results[i]['body']['stock'] for i in (0, 2, 3, 5, 6)] == [5, 2, 2, 3, 3]
+    assert [p['stock'] for p in results[1]['body']] == [5]
+    assert [p['stock'] for p in results[4]['body']] == [2]
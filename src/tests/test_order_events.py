@@ -0,0 +1,28 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture
+def headers(app):
+    app.config['ORDER_STREAM_MAX_CONNECTIONS'] = 2
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+
+def test_stream_limit_per_worker(client, app, headers):
+    first = client.get('/api/orders/stream', headers=headers)
+    second = client.get('/api/orders/stream', headers=headers)
+    assert (first.status_code, second.status_code) == (200, 200)
+
+    full = client.get('/api/orders/stream', headers=headers)
+    assert full.status_code == 503
+    assert full.get_data(as_text=True).startswith('retry: ')
+
+    # Cerrar un stream sin haberlo leído libera su plaza
+    first.close()
+    third = client.get('/api/orders/stream', headers=headers)
+    assert third.status_code == 200
+    second.close()
+    third.close()
+    assert app.extensions['order_events'].count == 0
+    assert not app.extensions['order_events'].subscribers
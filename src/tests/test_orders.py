@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from api.archive import archive_orders
+from api.models import db, User, Order
+
+
+@pytest.fixture
+def headers(app):
+    """Un pedido por mes de 2025; los entregados antes de julio se archivan, el de enero sigue abierto"""
+    with app.app_context():
+        db.session.add(User(email='ana@test.com', password='x', is_active=True))
+        statuses = ['delivered'] * 11 + ['pending']
+        for day, status in enumerate(statuses, start=1):
+            db.session.add(Order(user_id=1, total_amount=10, status=status,
+                                 created_at=datetime(2025, day % 12 + 1, 1)))
+        db.session.commit()
+        archive_orders(datetime(2025, 7, 1), echo=lambda message: None)
+        return {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+
+def created(orders):
+    return [(order['created_at'][:7], order['archived']) for order in orders]
+
+
+def test_archived_orders_are_merged_by_date(client, headers):
+    response = client.get('/api/orders?include_archived=1&limit=100', headers=headers)
+    assert response.status_code == 200
+    assert created(response.get_json()) == [
+        ('2025-12', False), ('2025-11', False), ('2025-10', False), ('2025-09', False),
+        ('2025-08', False), ('2025-07', False), ('2025-06', True), ('2025-05', True),
+        ('2025-04', True), ('2025-03', True), ('2025-02', True), ('2025-01', False),
+    ]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_orders_are_paged_with_cursor(client, headers):
+    pages, url = [], '/api/orders?include_archived=1&limit=5'
+    while True:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        pages.append(created(response.get_json()))
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+        url = f'/api/orders?include_archived=1&limit=5&before={cursor}'
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert [month for page in pages for month, _ in page] == [f'2025-{m:02}' for m in range(12, 0, -1)]
+
+    hot = client.get('/api/orders?limit=100', headers=headers).get_json()
+    assert all(not archived for _, archived in created(hot)) and len(hot) == 7
+
+
+def test_invalid_cursor(client, headers):
+    assert client.get('/api/orders?before=ayer', headers=headers).status_code == 400
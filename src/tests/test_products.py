@@ -0,0 +1,168 @@
+import pytest
+
+from api.models import db, Product
+from api.routes import MAX_BULK_PRODUCTS
+
+NEW_PRODUCT = {'name': 'Gorro', 'description': 'Gorro de lana para invierno', 'price': 15,
+               'stock': 3, 'category_id': 1}
+
+
+def stored(app, product_id=1):
+    with app.app_context():
+        return db.session.get(Product, product_id)
+
+
+def test_patch_requires_version(client):
+    response = client.patch('/api/products/1', json={'stock': 2})
+    assert response.status_code == 428
+
+
+def test_patch_stale_version_conflicts(client):
+    response = client.patch('/api/products/1', json={'stock': 2}, headers={'If-Match': '"7"'})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 1
+    assert response.headers['ETag'] == '"1"'
+
+
+def test_patch_returns_coerced_values(client, app):
+    response = client.patch('/api/products/1', json={'version': 1, 'stock': '7', 'price': '12.5'})
+    assert response.status_code == 200
+    assert response.get_json() == {'id': 1, 'version': 2, 'stock': 7, 'price': 12.5}
+    assert response.headers['ETag'] == '"2"'
+    product = stored(app)
+    assert (product.stock, float(product.price), product.version) == (7, 12.5, 2)
+
+
+def test_patch_keeps_null_for_nullable_columns(client, app):
+    response = client.patch('/api/products/1', json={'version': 1, 'image_url': None})
+    assert response.status_code == 200
+    assert stored(app).image_url is None
+
+
+@pytest.mark.parametrize('body', [
+    {'is_active': 'false'},
+    {'stock': None},
+    {'price': True},
+    {'price': 'nan'},
+    {'price': 'Infinity'},
+    {'stock': 2.5},
+])
+def test_patch_rejects_invalid_values(client, app, body):
+    response = client.patch('/api/products/1', json={'version': 1, **body})
+    assert response.status_code == 400
+    assert stored(app).version == 1
+
+
+def test_patch_is_active_false(client, app):
+    response = client.patch('/api/products/1', json={'is_active': False}, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert stored(app).is_active is False
+
+
+@pytest.mark.parametrize('body', [
+    {'products': [{'id': 1, 'stock': None}]},
+    {'products': [{'id': 1, 'price': True}]},
+])
+def test_bulk_patch_rejects_invalid_values(client, body):
+    assert client.patch('/api/products', json=body).status_code == 400
+
+
+def test_bulk_patch_converts_values(client, app):
+    response = client.patch('/api/products', json={'products': [
+        {'id': 1, 'version': '1', 'stock': '9', 'price': '18.25'}]})
+    assert response.status_code == 200
+    product = stored(app)
+    assert (product.stock, float(product.price), product.version) == (9, 18.25, 2)
+
+
+def test_bulk_patch_stale_version_conflicts(client):
+    response = client.patch('/api/products', json={'products': [{'id': 1, 'version': 5, 'stock': 1}]})
+    assert response.status_code == 409
+    assert response.get_json()['conflicts'] == [{'id': 1, 'version': 1}]
+
+
+def test_put_honours_if_match(client, app):
+    response = client.put('/api/products/1', json={'stock': 4}, headers={'If-Match': '"2"'})
+    assert response.status_code == 409
+    assert stored(app).stock == 5
+
+    response = client.put('/api/products/1', json={'stock': 4}, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"2"'
+    assert stored(app).stock == 4
+
+
+def test_put_without_version_still_updates(client, app):
+    response = client.put('/api/products/1', json={'stock': '6'})
+    assert response.status_code == 200
+    assert response.get_json()['stock'] == 6
+
+
+def test_put_rejects_explicit_null(client, app):
+    assert client.put('/api/products/1', json={'stock': None}).status_code == 400
+    assert stored(app).stock == 5
+
+
+def test_create_strips_and_coerces(client):
+    response = client.post('/api/products', json={**NEW_PRODUCT, 'name': '  Gorro  ', 'stock': '4'})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['name'], body['stock'], body['image_url'], body['is_active']) == ('Gorro', 4, None, True)
+
+
+@pytest.mark.parametrize('price', ['nan', 'Infinity', True])
+def test_create_rejects_non_finite_price(client, price):
+    assert client.post('/api/products', json={**NEW_PRODUCT, 'price': price}).status_code == 400
+
+
+def suggested(client, text):
+    return [p['name'] for p in client.get(f'/api/products/suggest?q={text}').get_json()['products']]
+
+
+def test_created_product_appears_in_suggestions(client, app):
+    # Construye el índice antes de crear el producto
+    assert suggested(client, 'bufanda') == []
+    response = client.post('/api/products', json={**NEW_PRODUCT, 'name': 'Bufanda'})
+    assert response.status_code == 201
+
+    # El hilo de refresco se despierta con el cambio, sin esperar al refresco periódico
+    assert app.extensions['suggest'].wait(5)
+    assert suggested(client, 'bufanda') == ['Bufanda']
+
+
+def test_deleted_and_renamed_products_leave_suggestions_at_once(client, app):
+    assert suggested(client, 'osi') == ['Osito']
+    response = client.put('/api/products/1', json={'name': 'Conejito'})
+    assert response.status_code == 200
+    # Sin esperar al hilo de refresco
+    assert suggested(client, 'osi') == []
+    assert app.extensions['suggest'].wait(5)
+    assert suggested(client, 'cone') == ['Conejito']
+
+    response = client.post('/api/products', json={**NEW_PRODUCT, 'name': 'Osito polar'})
+    assert app.extensions['suggest'].wait(5)
+    assert suggested(client, 'osi') == ['Osito polar']
+    assert client.delete(f"/api/products/{response.get_json()['id']}").status_code == 200
+    assert suggested(client, 'osi') == []
+
+@pytest.mark.parametrize('with_versions', [False, True])
+def test_bulk_patch_at_maximum_size(client, app, with_versions):
+    with app.app_context():
+        db.session.execute(Product.__table__.insert(), [
+            {'name': f'Producto {x}', 'price': 10, 'stock': 1, 'category_id': 1, 'is_active': True}
+            for x in range(MAX_BULK_PRODUCTS - 1)])
+        db.session.commit()
+    items = [{'id': x, 'price': 11, 'stock': x, **({'version': 1} if with_versions else {})}
+             for x in range(1, MAX_BULK_PRODUCTS + 1)]
+    response = client.patch('/api/products', json={'products': items})
+    assert response.status_code == 200
+    assert response.get_json() == {'updated': MAX_BULK_PRODUCTS}
+    product = stored(app, MAX_BULK_PRODUCTS)
+    assert (product.stock, float(product.price), product.version) == (MAX_BULK_PRODUCTS, 11, 2)
+
+    if with_versions:
+        items[-1]['stock'] = 0
+        response = client.patch('/api/products', json={'products': items})
+        assert response.status_code == 409
+        assert len(response.get_json()['conflicts']) == MAX_BULK_PRODUCTS
+        assert stored(app, MAX_BULK_PRODUCTS).stock == MAX_BULK_PRODUCTS
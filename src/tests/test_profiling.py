@@ -0,0 +1,24 @@
+import threading
+
+from api import profiling
+from api.profiling import RequestProfile
+
+
+def test_second_cprofile_falls_back_to_sampling():
+    first = RequestProfile('cprofile', 0.001)
+    try:
+        assert first.mode == 'cprofile'
+        results = []
+        thread = threading.Thread(target=lambda: results.append(RequestProfile('cprofile', 0.001)))
+        thread.start()
+        thread.join()
+        second = results[0]
+        assert second.mode == 'sample'
+        second.stop()
+    finally:
+        first.stop()
+    assert not profiling._cprofile_lock.locked()
+
+    again = RequestProfile('cprofile', 0.001)
+    again.stop()
+    assert again.mode == 'cprofile'
@@ -0,0 +1,78 @@
+import pytest
+
+from app import create_app
+from api.models import db, Category, Product
+from api.replica import STICKY_COOKIE
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Primario y réplica en dos ficheros SQLite; la réplica no recibe las escrituras"""
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_BINDS': {'replica': replica_url},
+        'DATABASE_READ_URL': replica_url,
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        'LOG_LEVEL': 'WARNING',
+    })
+    with app.app_context():
+        for engine in (db.engine, db.engines['replica']):
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(Category.__table__.insert(), [{'name': 'Amigurumis'}])
+                connection.execute(Product.__table__.insert(), [
+                    {'name': 'Osito', 'price': 20, 'stock': 5, 'category_id': 1, 'is_active': True}])
+    yield app
+    with app.app_context():
+        db.session.remove()
+        app.extensions['replica'].engine.dispose()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def stocks(response):
+    return [result['body'] for result in response.get_json()['results']]
+
+
+def test_read_only_batch_does_not_pin_to_primary(client):
+    response = client.post('/api/batch', json={'requests': [
+        {'method': 'GET', 'path': '/api/products'}, {'method': 'GET', 'path': '/api/categories'}]})
+    assert response.status_code == 200
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_batch_reads_its_own_writes(client, parallel):
+    response = client.post('/api/batch', json={'parallel': parallel, 'requests': [
+        {'method': 'PATCH', 'path': '/api/products/1', 'body': {'version': 1, 'stock': 2}},
+        {'method': 'GET', 'path': '/api/products'},
+        {'method': 'GET', 'path': '/api/products/1'},
+    ]})
+    assert response.status_code == 200
+    patched, listing, detail = stocks(response)
+    assert patched['stock'] == 2
+    assert [p['stock'] for p in listing] == [2]
+    assert detail['stock'] == 2
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+
+
+def test_failed_write_in_batch_keeps_replica(client):
+    response = client.post('/api/batch', json={'requests': [
+        {'method': 'PATCH', 'path': '/api/products/1', 'body': {'version': 9, 'stock': 2}},
+        {'method': 'GET', 'path': '/api/products'},
+    ]})
+    assert stocks(response)[1][0]['stock'] == 5
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+def test_lagging_replica_does_not_refill_product_cache(app, client):
+    assert client.patch('/api/products/1', json={'version': 1, 'stock': 2}).status_code == 200
+
+    # Otro cliente, sin la cookie de escritura: lee de la réplica, que va por detrás
+    reader = app.test_client()
+    assert reader.get('/api/products/1').get_json()['stock'] == 5
+    with app.app_context(), db.engines['replica'].begin() as connection:
+        connection.execute(Product.__table__.update().values(stock=2, version=2))
+    assert reader.get('/api/products/1').get_json()['stock'] == 2
@@ -1,7 +1,18 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
+#
+# La app se construye al importar este módulo; con `gunicorn --preload` eso
+# ocurre una vez en el proceso maestro y los workers comparten esa memoria
+# (copy-on-write). Los comandos `flask ...` usan create_app() desde app.py.
 
-from app import app as application
+from app import create_app
+from api.suggest import warm_suggest_index
+
+application = create_app({'ENABLE_CLI': False})
+
+if application.config['SUGGEST_PRELOAD']:
+    # Índice de sugerencias compartido por los workers (ver api/suggest.py)
+    warm_suggest_index(application)
 
 if __name__ == "__main__":
     application.run()